@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import random
+import time
+
+from BlackjackSimulator import GameState, Strategy, BasicStrategy, NullSink
+from Instrumentation import PhaseStats
+
+#Runs many tables in one process on an asyncio event loop, with each player's decisions made by an agent that may take a while to answer, such as a bot behind a local service.
+#Agents have the same four decisions as a Strategy, written as coroutines: get_bet, take_insurance, choose_action, and rebuy. While one table waits on an agent the loop moves on to the others. A scheduler caps how many decisions can be waiting at once and gives each one a time limit. A decision that runs out of time, fails with an error, or comes back with an action that is not allowed, is made by the seat's fallback strategy instead, so one broken agent never stops the other tables.
+#The table's own rounds are unchanged. Bets, insurance, and rebuys are asked for just before the phase that needs them and handed to the table through the seat's strategy, and only the player turns are driven from here.
+
+#The strategy for a seat played by an agent. Holds the agent's answers until the table asks for them, and answers from the fallback strategy when the agent has not been asked, so the table can still be played with play_round.
+class AgentSeat(Strategy):
+    def __init__(self, agent, fallback = None):
+        super().__init__()
+        self.agent = agent
+        self.fallback = fallback if fallback is not None else Strategy()
+        self.answers = {}
+
+    def get_bet(self, player, game):
+        if "get_bet" in self.answers:
+            return self.answers.pop("get_bet")
+        return self.fallback.get_bet(player, game)
+
+    def take_insurance(self, player, game):
+        if "take_insurance" in self.answers:
+            return self.answers.pop("take_insurance")
+        return self.fallback.take_insurance(player, game)
+
+    def rebuy(self, player, game):
+        if "rebuy" in self.answers:
+            return self.answers.pop("rebuy")
+        return self.fallback.rebuy(player, game)
+
+    def choose_action(self, hand, valid_actions, game):
+        return self.fallback.choose_action(hand, valid_actions, game)
+
+#Plays a Strategy as an agent, pausing before each answer to stand in for the time an outside agent would take. Pauses are drawn evenly between delay and delay + jitter.
+class StrategyAgent:
+    def __init__(self, strategy, delay = 0.0, jitter = 0.0, seed = None):
+        self.strategy = strategy
+        self.delay = delay
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    async def pause(self):
+        await asyncio.sleep(self.delay + self.rng.random() * self.jitter)
+
+    async def get_bet(self, player, game):
+        await self.pause()
+        return self.strategy.get_bet(player, game)
+
+    async def take_insurance(self, player, game):
+        await self.pause()
+        return self.strategy.take_insurance(player, game)
+
+    async def rebuy(self, player, game):
+        await self.pause()
+        return self.strategy.rebuy(player, game)
+
+    async def choose_action(self, hand, valid_actions, game):
+        await self.pause()
+        return self.strategy.choose_action(hand, valid_actions, game)
+
+#Shares a limit on decisions in flight between every table on the loop, and gives each decision a time limit in seconds.
+class TableScheduler:
+    def __init__(self, max_in_flight = 100, timeout = 1.0):
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    #Asks the seat's agent for a decision, recording the time spent waiting for a slot and the time the agent took. Falls back to the seat's fallback strategy when the agent runs out of time or raises an error.
+    async def decide(self, table, seat, method, *args):
+        clock = time.perf_counter_ns
+        start = clock()
+        async with self.slots:
+            asked = clock()
+            table.metrics["queue"].add(asked - start)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return await asyncio.wait_for(getattr(seat.agent, method)(*args), self.timeout)
+            except asyncio.TimeoutError:
+                table.timeouts += 1
+                return getattr(seat.fallback, method)(*args)
+            except Exception: #Such as a service behind the agent dropping its connection.
+                table.agent_errors += 1
+                return getattr(seat.fallback, method)(*args)
+            finally:
+                self.in_flight -= 1
+                table.metrics["decision"].add(clock() - asked)
+                table.decisions += 1
+
+#A silent table whose players are asked for their decisions through the scheduler. Seats with a plain Strategy are still answered straight away.
+class AsyncTable(GameState):
+    def __init__(self, scheduler, seed = None, **rules):
+        super().__init__(seed, **rules)
+        self.output = NullSink()
+        self.scheduler = scheduler
+        self.metrics = {"queue": PhaseStats(), "decision": PhaseStats(), "round": PhaseStats()}
+        self.decisions = 0
+        self.timeouts = 0
+        self.agent_errors = 0
+        self.fallback_actions = 0
+
+    def add_agent(self, name, agent, fallback = None):
+        return self.add_player(name, AgentSeat(agent, fallback))
+
+    #Asks every given player's agent for the same decision at once and leaves the answers with their seats.
+    async def prefetch(self, players, method):
+        seats = [p for p in players if isinstance(p.strategy, AgentSeat)]
+        answers = await asyncio.gather(*(self.scheduler.decide(self, p.strategy, method, p, self) for p in seats))
+        for p, answer in zip(seats, answers):
+            p.strategy.answers[method] = answer
+
+    #Works like GameState.player_turn, waiting on the agent for each action.
+    async def player_turn_async(self, player):
+        if not isinstance(player.strategy, AgentSeat):
+            self.player_turn(player)
+            return
+        seat = player.strategy
+        for h in player.hands:
+            while not h.locked:
+                if h.firstTurn:
+                    h.print_hand()
+                    if h.isBlackjack:
+                        self.display("blackjack", "\033[32m{player} has a blackjack!\033[0m", player = player.name)
+                        h.locked = True
+                    else:
+                        self.dealer.show_upcard()
+                if not h.isBlackjack:
+                    valid_options = h.create_action_list(self)
+                    player_action = await self.scheduler.decide(self, seat, "choose_action", h, valid_options, self)
+                    if player_action not in valid_options:
+                        self.fallback_actions += 1
+                        player_action = seat.fallback.choose_action(h, valid_options, self)
+                    h.resolve_action(player_action, self)
+
+    #Plays a single round like GameState.play_round, letting other tables run while this one waits on its agents.
+    async def play_round_async(self):
+        start = time.perf_counter_ns()
+        self.check_shoe_size()
+        await self.prefetch(self.players_list, "get_bet")
+        self.initial_deal()
+        if len(self.players_list) == 0:
+            return False
+        if self.dealer.hands[0].cards[0].rank == "A":
+            await self.prefetch([p for p in self.players_list if p.bankroll >= p.hands[0].bet * self.insurance_cost], "take_insurance")
+        if self.dealer_start_round_checks():
+            for p in self.players_list:
+                await self.player_turn_async(p)
+            self.dealer.dealer_turn(self)
+            self.settle_round()
+        await self.prefetch([p for p in self.players_list if p.bankroll < 1], "rebuy")
+        self.round_cleanup()
+        self.round_number += 1
+        self.metrics["round"].add(time.perf_counter_ns() - start)
+        return True
+
+    async def simulate_async(self, rounds):
+        played = 0
+        while played < rounds and len(self.players_list) > 0:
+            if not await self.play_round_async():
+                break
+            played += 1
+        return played
+
+    def snapshot(self):
+        return {"rounds": self.round_number, "decisions": self.decisions, "timeouts": self.timeouts, "agent_errors": self.agent_errors, "fallback_actions": self.fallback_actions, "latency": {name: stats.snapshot() for name, stats in self.metrics.items()}}
+
+#Plays every table for up to the given number of rounds at the same time. Returns the number of rounds each table played.
+async def run_tables(tables, rounds):
+    return await asyncio.gather(*(t.simulate_async(rounds) for t in tables))
+
+#Builds the given number of tables, each seeded from the master seed and seated with StrategyAgents playing basic strategy, and plays them on one event loop.
+def run_async_simulation(num_tables, rounds, num_players = 1, seed = 0, max_in_flight = 100, timeout = 1.0, delay = 0.0, jitter = 0.0):
+    async def main():
+        scheduler = TableScheduler(max_in_flight, timeout)
+        master = random.Random(seed)
+        tables = []
+        for t in range(num_tables):
+            table = AsyncTable(scheduler, master.getrandbits(64))
+            for p in range(num_players):
+                table.add_agent("Player {num}".format(num = p + 1), StrategyAgent(BasicStrategy(rebuy = True), delay, jitter, master.getrandbits(64)), BasicStrategy(rebuy = True))
+            tables.append(table)
+        await run_tables(tables, rounds)
+        return scheduler, tables
+    return asyncio.run(main())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Plays many tables in one process with simulated slow agents.")
+    parser.add_argument("rounds", type = int, help = "Rounds to play at each table.")
+    parser.add_argument("--tables", type = int, default = 100)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--max-in-flight", type = int, default = 100, help = "Decisions allowed to wait on agents at once, across all tables.")
+    parser.add_argument("--timeout", type = float, default = 1.0, help = "Seconds an agent has to answer before the fallback strategy decides.")
+    parser.add_argument("--delay", type = float, default = 0.0, help = "Seconds each agent takes to answer.")
+    parser.add_argument("--jitter", type = float, default = 0.0, help = "Extra random seconds added to each answer.")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    scheduler, tables = run_async_simulation(args.tables, args.rounds, args.players, args.seed, args.max_in_flight, args.timeout, args.delay, args.jitter)
+    elapsed = time.perf_counter() - start
+    decision_ns = sum(t.metrics["decision"].total_ns for t in tables)
+    decisions = sum(t.decisions for t in tables)
+    rounds = sum(t.round_number for t in tables)
+    print("Played {rounds} rounds at {tables} tables in {seconds:.2f} s ({rate:.0f} rounds/s).".format(rounds = rounds, tables = len(tables), seconds = elapsed, rate = rounds / elapsed))
+    print("Decisions: {decisions}, timeouts: {timeouts}, agent errors: {errors}, most in flight: {peak}.".format(decisions = decisions, timeouts = sum(t.timeouts for t in tables), errors = sum(t.agent_errors for t in tables), peak = scheduler.peak_in_flight))
+    print("Mean decision time: {mean:.2f} ms. Slowest table mean round time: {slowest:.2f} ms.".format(mean = decision_ns / max(decisions, 1) / 1e6, slowest = max(t.metrics["round"].total_ns / max(t.metrics["round"].calls, 1) for t in tables) / 1e6))
@@ -0,0 +1,373 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import time
+
+from BlackjackSimulator import BasicStrategy
+from SimulationRunner import SimulationTable, derive_seeds, split_rounds
+
+#Follows every player's bankroll round by round without keeping the rounds. Each statistic uses a fixed amount of memory however long the run, and every one can be merged with the same statistic from another process.
+#Attach with analytics.attach(game). It is handed each round from GameState.round_cleanup, after the hands are settled and before any rebuys, like a hand history writer, and passes the round on to any writer that was already attached.
+#Snapshots can be taken at any time, and can be written to a JSON file or passed to a callback every so many rounds or seconds, so a running job can be watched without stopping it.
+
+#Count, mean, and variance by Welford's method, with the minimum and maximum. Merging uses the pairwise update of Chan et al.
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 #Sum of squared differences from the mean.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def snapshot(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean, "std_dev": math.sqrt(self.variance()), "min": self.min, "max": self.max}
+
+#Quantiles to within a relative error, by keeping counts in buckets whose edges grow by a constant factor (a DDSketch). The number of buckets only grows with the log of the range of values, and is capped by folding the buckets nearest zero together.
+class QuantileSketch:
+    def __init__(self, relative_accuracy = 0.01, max_buckets = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x > 0:
+            buckets = self.positive
+        elif x < 0:
+            buckets = self.negative
+            x = -x
+        else:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        buckets[key] = buckets.get(key, 0) + 1
+        if len(buckets) > self.max_buckets:
+            self.fold(buckets)
+
+    #Folds the bucket nearest zero into the next one up.
+    def fold(self, buckets):
+        keys = sorted(buckets)
+        buckets[keys[1]] += buckets.pop(keys[0])
+
+    def merge(self, other):
+        for buckets, others in [(self.positive, other.positive), (self.negative, other.negative)]:
+            for key, count in others.items():
+                buckets[key] = buckets.get(key, 0) + count
+            while len(buckets) > self.max_buckets:
+                self.fold(buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse = True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self.value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self.value(key)
+        return self.value(max(self.positive))
+
+    def snapshot(self, quantiles = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)):
+        return {"p{q:g}".format(q = q * 100): self.quantile(q) for q in quantiles}
+
+#Counts values in equal-width bins between low and high, with one more bin on each side for values outside.
+class Histogram:
+    def __init__(self, low, high, bins):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.counts = [0] * (bins + 2)
+
+    def add(self, x):
+        if x < self.low:
+            self.counts[0] += 1
+        elif x >= self.high:
+            self.counts[-1] += 1
+        else:
+            self.counts[1 + int((x - self.low) / self.width)] += 1
+
+    def merge(self, other):
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Only histograms with the same bins can be merged.")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    def snapshot(self):
+        return {"low": self.low, "high": self.high, "bins": self.bins, "below": self.counts[0], "counts": self.counts[1:-1], "above": self.counts[-1]}
+
+#Tracks the largest drop from a high point of a running total. Merging keeps the larger of the two drops.
+class DrawdownTracker:
+    def __init__(self):
+        self.peak = 0.0
+        self.current = 0.0
+        self.max_drawdown = 0.0
+        self.longest = 0 #Most rounds spent below a high point.
+        self.below = 0
+
+    def add(self, total):
+        if total >= self.peak:
+            self.peak = total
+            self.below = 0
+        else:
+            self.below += 1
+            self.longest = max(self.longest, self.below)
+        self.current = self.peak - total
+        self.max_drawdown = max(self.max_drawdown, self.current)
+
+    def merge(self, other):
+        self.max_drawdown = max(self.max_drawdown, other.max_drawdown)
+        self.longest = max(self.longest, other.longest)
+        return self
+
+    def snapshot(self):
+        return {"max_drawdown": self.max_drawdown, "current_drawdown": self.current, "longest_rounds": self.longest}
+
+#The statistics kept for one seat, or for the table as a whole. Nets leave out rebuys, so the running result keeps falling when a player rebuys after going broke.
+class BankrollStats:
+    def __init__(self, net_range = (-100, 100), bins = 40, relative_accuracy = 0.01):
+        self.net = RunningStats()
+        self.net_quantiles = QuantileSketch(relative_accuracy)
+        self.net_histogram = Histogram(net_range[0], net_range[1], bins)
+        self.bankroll = RunningStats()
+        self.bankroll_quantiles = QuantileSketch(relative_accuracy)
+        self.drawdown = DrawdownTracker()
+        self.time_to_ruin = RunningStats()
+        self.result = 0.0
+        self.ruins = 0
+        self.rebuys = 0
+        self.since_ruin = 0
+
+    def add_round(self, net, bankroll):
+        self.net.add(net)
+        self.net_quantiles.add(net)
+        self.net_histogram.add(net)
+        self.bankroll.add(bankroll)
+        self.bankroll_quantiles.add(bankroll)
+        self.result += net
+        self.drawdown.add(self.result)
+        self.since_ruin += 1
+
+    def add_ruin(self):
+        self.ruins += 1
+        self.time_to_ruin.add(self.since_ruin)
+        self.since_ruin = 0
+
+    def merge(self, other):
+        for name in ["net", "net_quantiles", "net_histogram", "bankroll", "bankroll_quantiles", "drawdown", "time_to_ruin"]:
+            getattr(self, name).merge(getattr(other, name))
+        self.result += other.result
+        self.ruins += other.ruins
+        self.rebuys += other.rebuys
+        return self
+
+    def snapshot(self):
+        return {"rounds": self.net.count, "result": self.result, "net": self.net.snapshot(), "net_quantiles": self.net_quantiles.snapshot(), "net_histogram": self.net_histogram.snapshot(), "bankroll": self.bankroll.snapshot(), "bankroll_quantiles": self.bankroll_quantiles.snapshot(), "drawdown": self.drawdown.snapshot(), "ruins": self.ruins, "rebuys": self.rebuys, "time_to_ruin": self.time_to_ruin.snapshot()}
+
+class BankrollAnalytics:
+    def __init__(self, path = None, callback = None, every_rounds = None, every_seconds = None, net_range = (-100, 100), bins = 40, relative_accuracy = 0.01):
+        self.path = path #Stats file rewritten with each snapshot.
+        self.callback = callback #Called with each snapshot.
+        self.every_rounds = every_rounds
+        self.every_seconds = every_seconds
+        self.options = (net_range, bins, relative_accuracy)
+        self.table = BankrollStats(*self.options)
+        self.players = {} #Keyed by player name, so the same seat at tables in different processes is merged together.
+        self.last_bankrolls = {}
+        self.rounds = 0
+        self.last_rounds = 0
+        self.last_time = time.time()
+        self.inner = None
+
+    def attach(self, game):
+        self.inner = game.history
+        game.history = self
+        for p in game.players_list:
+            self.last_bankrolls[p.name] = p.bankroll
+        return self
+
+    def detach(self, game):
+        game.history = self.inner
+        self.inner = None
+
+    #Called from GameState.round_cleanup. A player who was broke at the end of the last round and is still seated has rebought since.
+    def record_round(self, game):
+        if self.inner is not None:
+            self.inner.record_round(game)
+        table_net = 0.0
+        ruined = 0
+        for p in game.players_list:
+            stats = self.players.get(p.name)
+            if stats is None:
+                stats = self.players[p.name] = BankrollStats(*self.options)
+            last = self.last_bankrolls.get(p.name, game.buy_in)
+            if last < 1:
+                last += game.buy_in
+                stats.rebuys += 1
+                self.table.rebuys += 1
+            net = p.bankroll - last
+            stats.add_round(net, p.bankroll)
+            if p.bankroll < 1:
+                stats.add_ruin()
+                ruined += 1
+            self.last_bankrolls[p.name] = p.bankroll
+            table_net += net
+        self.table.add_round(table_net, sum(p.bankroll for p in game.players_list))
+        for r in range(ruined): #Added after the round, like each player's, so the table's time to ruin counts the round the ruin happened in.
+            self.table.add_ruin()
+        self.rounds += 1
+        if self.every_rounds and self.rounds - self.last_rounds >= self.every_rounds:
+            self.emit()
+        elif self.every_seconds and time.time() - self.last_time >= self.every_seconds:
+            self.emit()
+
+    #Adds in the statistics from another table, usually one played in another process.
+    def merge(self, other):
+        self.table.merge(other.table)
+        for name, stats in other.players.items():
+            if name in self.players:
+                self.players[name].merge(stats)
+            else:
+                self.players[name] = BankrollStats(*self.options).merge(stats)
+        self.rounds += other.rounds
+        return self
+
+    def snapshot(self):
+        return {"time": time.time(), "rounds": self.rounds, "table": self.table.snapshot(), "players": {name: stats.snapshot() for name, stats in self.players.items()}}
+
+    #Writes a snapshot to the stats file and passes it to the callback. The file is replaced in one step so readers never see half a snapshot.
+    def emit(self):
+        snapshot = self.snapshot()
+        self.last_rounds = self.rounds
+        self.last_time = time.time()
+        if self.path:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.path)
+        if self.callback:
+            self.callback(snapshot)
+        return snapshot
+
+    #Writers and callbacks stay in the process that made them.
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(path = None, callback = None, inner = None)
+        return state
+
+#Plays one shard at its own table. Every so many rounds a copy of the analytics so far is put on the queue for the parent process. Takes a single tuple so it can be used with Pool.map.
+def run_shard(shard):
+    index, seed, rounds, num_players, strategy, decks, progress, every_rounds = shard
+    table = SimulationTable(seed, decks)
+    seated = [table.add_player("Player {num}".format(num = p + 1), strategy) for p in range(num_players)]
+    analytics = BankrollAnalytics().attach(table)
+    while table.stats["rounds"] < rounds and len(table.players_list) > 0:
+        if not table.play_tracked_round(seated):
+            break
+        if progress is not None and table.stats["rounds"] % every_rounds == 0:
+            progress.put((index, analytics))
+    return analytics
+
+def merge_all(parts):
+    total = BankrollAnalytics()
+    for part in parts:
+        total.merge(part)
+    return total
+
+#Shards the rounds across a process pool like SimulationRunner.run_simulation and merges the analytics. With every_rounds set, the workers report their progress and the callback gets a merged snapshot each time one does, while the workers keep playing.
+def run_analytics(rounds, workers = None, seed = 0, num_players = 1, strategy = None, decks = None, every_rounds = None, callback = None):
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if strategy is None:
+        strategy = BasicStrategy(rebuy = True)
+    seeds = derive_seeds(seed, workers)
+    shares = split_rounds(rounds, workers)
+    if not (every_rounds and callback):
+        shards = [(i, s, r, num_players, strategy, decks, None, None) for i, (s, r) in enumerate(zip(seeds, shares))]
+        with multiprocessing.Pool(workers) as pool:
+            return merge_all(pool.map(run_shard, shards, chunksize = 1))
+    with multiprocessing.Manager() as manager:
+        progress = manager.Queue()
+        shards = [(i, s, r, num_players, strategy, decks, progress, every_rounds) for i, (s, r) in enumerate(zip(seeds, shares))]
+        with multiprocessing.Pool(workers) as pool:
+            result = pool.map_async(run_shard, shards, chunksize = 1)
+            latest = {}
+            while not result.ready():
+                try:
+                    index, part = progress.get(timeout = 0.1)
+                except queue.Empty:
+                    continue
+                latest[index] = part
+                callback(merge_all(latest.values()).snapshot())
+            parts = result.get()
+    return merge_all(parts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Runs a headless simulation and reports bankroll statistics for each seat and the table.")
+    parser.add_argument("rounds", type = int)
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--decks", type = int, default = None)
+    parser.add_argument("--bet", type = int, default = 10)
+    parser.add_argument("--every", type = int, default = None, help = "Rounds per worker between progress reports.")
+    parser.add_argument("--output", help = "JSON file rewritten with every progress report and the final results.")
+    args = parser.parse_args()
+    def report(snapshot):
+        if args.output:
+            temp_path = args.output + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, args.output)
+        table = snapshot["table"]
+        print("{rounds} rounds, table result {result:.2f}, max drawdown {drawdown:.2f}, ruins {ruins}, rebuys {rebuys}".format(rounds = snapshot["rounds"], result = table["result"], drawdown = table["drawdown"]["max_drawdown"], ruins = table["ruins"], rebuys = table["rebuys"]))
+    analytics = run_analytics(args.rounds, args.workers, args.seed, args.players, BasicStrategy(args.bet, rebuy = True), args.decks, args.every, report)
+    report(analytics.snapshot())
@@ -0,0 +1,207 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from BlackjackSimulator import GameState, Hand, BasicStrategy, NullSink
+
+#Times the simulator's hot paths and whole sessions, and writes the results as JSON. Passing a baseline file compares against an earlier run and exits with an error if anything got slower by more than the tolerance.
+
+#Returns the mean and percentiles of a list of per-call times in nanoseconds.
+def latency_stats(times):
+    times = sorted(times)
+    def percentile(p):
+        return times[min(len(times) - 1, int(p / 100 * len(times)))]
+    return {"calls": len(times), "mean_ns": sum(times) / len(times), "p50_ns": percentile(50), "p90_ns": percentile(90), "p99_ns": percentile(99), "max_ns": times[-1]}
+
+#Times each call to func separately. setup runs before every call and is not timed.
+def time_calls(func, calls, setup = None):
+    clock = time.perf_counter_ns
+    times = []
+    for c in range(calls):
+        if setup is not None:
+            setup()
+        start = clock()
+        func()
+        times.append(clock() - start)
+    return latency_stats(times)
+
+#Builds a silent table with automated players.
+def make_table(decks, players, seed = 1):
+    game = GameState(seed, decks = decks)
+    game.output = NullSink()
+    for p in range(players):
+        game.add_player("Player {num}".format(num = p + 1), BasicStrategy(rebuy = True))
+    return game
+
+#Times a fresh Python process importing the simulator, which should do nothing but define the classes.
+def bench_import(runs):
+    code = "import time; start = time.perf_counter_ns(); import BlackjackSimulator; print(time.perf_counter_ns() - start)"
+    times = []
+    for r in range(runs):
+        times.append(int(subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True, cwd = os.path.dirname(os.path.abspath(__file__))).stdout)) #Runs next to the simulator so it imports from any working directory.
+    return latency_stats(times)
+
+#Times making a table with its players seated, then playing its first round, which is when the deck is first needed.
+def bench_startup(decks, players, calls):
+    ready = time_calls(lambda: make_table(decks, players), calls)
+    tables = []
+    def new_table():
+        tables.append(make_table(decks, players))
+    first_round = time_calls(lambda: tables.pop().play_round(), calls, new_table)
+    return ready, first_round
+
+def bench_create_deck(decks, calls):
+    game = make_table(decks, 0)
+    return time_calls(game.create_deck, calls)
+
+def bench_add_to_shoe(decks, calls):
+    game = make_table(decks, 0)
+    def empty_shoe():
+        game.shoe = []
+    return time_calls(game.add_to_shoe, calls, empty_shoe)
+
+def bench_deal_cards(decks, calls):
+    game = make_table(decks, 1)
+    hand = Hand(1, game.players_list[0])
+    def fresh_hand():
+        hand.cards = []
+        hand.total = 0
+        hand.soft_aces = 0
+        if len(game.shoe) < 1:
+            game.shoe = []
+            game.add_to_shoe()
+    return time_calls(lambda: game.deal_cards(hand), calls, fresh_hand)
+
+def bench_demote_ace(calls):
+    game = make_table(1, 1)
+    hand = Hand(1, game.players_list[0])
+    def soft_hand():
+        hand.total = 27
+        hand.soft_aces = 2
+    return time_calls(hand.demote_ace, calls, soft_hand)
+
+#Plays full rounds, timing each phase of GameState.play_round separately.
+def bench_round_phases(decks, players, rounds):
+    game = make_table(decks, players)
+    clock = time.perf_counter_ns
+    phases = {name: [] for name in ["check_shoe_size", "initial_deal", "dealer_start_round_checks", "player_turn", "dealer_turn", "settle_round", "round_cleanup", "round"]}
+    for r in range(rounds):
+        round_start = start = clock()
+        game.check_shoe_size()
+        phases["check_shoe_size"].append(clock() - start)
+        start = clock()
+        game.initial_deal()
+        phases["initial_deal"].append(clock() - start)
+        start = clock()
+        round_continues = game.dealer_start_round_checks()
+        phases["dealer_start_round_checks"].append(clock() - start)
+        if round_continues:
+            for p in game.players_list:
+                start = clock()
+                game.player_turn(p)
+                phases["player_turn"].append(clock() - start)
+            start = clock()
+            game.dealer.dealer_turn(game)
+            phases["dealer_turn"].append(clock() - start)
+            start = clock()
+            game.settle_round()
+            phases["settle_round"].append(clock() - start)
+        start = clock()
+        game.round_cleanup()
+        now = clock()
+        phases["round_cleanup"].append(now - start)
+        phases["round"].append(now - round_start)
+    return {name: latency_stats(times) for name, times in phases.items() if times}
+
+def gc_collections():
+    return sum(s["collections"] for s in gc.get_stats())
+
+#Plays a long session and reports rounds per second and how often the garbage collector ran, then plays a shorter one under tracemalloc for the peak memory.
+def bench_session(decks, players, rounds):
+    game = make_table(decks, players)
+    collections = gc_collections()
+    start = time.perf_counter()
+    played = game.simulate(rounds)
+    elapsed = time.perf_counter() - start
+    collections = gc_collections() - collections
+    tracemalloc.start()
+    game = make_table(decks, players)
+    game.simulate(max(1, rounds // 10))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"rounds": played, "seconds": elapsed, "rounds_per_sec": played / elapsed, "hands_per_sec": played * players / elapsed, "peak_memory_bytes": peak, "gc_collections": collections}
+
+#Builds many tables, plays a few rounds at each so their shoes and players are in use, and reports the memory they hold per table.
+def bench_table_memory(decks, players, tables = 100, rounds = 20):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [make_table(decks, players) for t in range(tables)]
+    for game in games:
+        game.simulate(rounds)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"tables": tables, "bytes_per_table": used / tables}
+
+def run_benchmarks(rounds = 20000, calls = 20000, deck_counts = (1, 6, 8), player_counts = (1, 3, 5)):
+    results = {}
+    results["demote_ace"] = bench_demote_ace(calls)
+    results["startup/import"] = bench_import(5)
+    for d in deck_counts:
+        results["create_deck/{decks}d".format(decks = d)] = bench_create_deck(d, max(1, calls // 20))
+        results["startup/ready_table/{decks}d".format(decks = d)], results["startup/first_round/{decks}d".format(decks = d)] = bench_startup(d, 3, max(1, calls // 20))
+        results["add_to_shoe/{decks}d".format(decks = d)] = bench_add_to_shoe(d, max(1, calls // 20))
+        results["deal_cards/{decks}d".format(decks = d)] = bench_deal_cards(d, calls)
+        for phase, stats in bench_round_phases(d, 3, max(1, rounds // 4)).items():
+            results["round/{decks}d_3p/{phase}".format(decks = d, phase = phase)] = stats
+        for p in player_counts:
+            results["session/{decks}d_{players}p".format(decks = d, players = p)] = bench_session(d, p, rounds)
+        results["memory/{decks}d_5p".format(decks = d)] = bench_table_memory(d, 5)
+    return {"python": platform.python_version(), "platform": platform.platform(), "rounds": rounds, "calls": calls, "results": results}
+
+#Lists every result that is slower than the baseline by more than the tolerance. Sessions compare rounds per second, memory results compare bytes per table, and everything else compares median latency.
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for name, stats in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        if "rounds_per_sec" in stats:
+            change = old["rounds_per_sec"] / stats["rounds_per_sec"] - 1
+        elif "bytes_per_table" in stats:
+            change = stats["bytes_per_table"] / old["bytes_per_table"] - 1
+        else:
+            change = stats["p50_ns"] / max(old["p50_ns"], 1) - 1
+        if change > tolerance:
+            regressions.append({"name": name, "slowdown": change})
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmarks the blackjack simulator and writes the results as JSON.")
+    parser.add_argument("--rounds", type = int, default = 20000, help = "Rounds per session.")
+    parser.add_argument("--calls", type = int, default = 20000, help = "Calls per micro-benchmark.")
+    parser.add_argument("--decks", type = int, nargs = "+", default = [1, 6, 8])
+    parser.add_argument("--players", type = int, nargs = "+", default = [1, 3, 5])
+    parser.add_argument("--output", help = "File to write the JSON report to. Prints it if left out.")
+    parser.add_argument("--baseline", help = "Earlier JSON report to compare against.")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "Allowed slowdown against the baseline, as a fraction.")
+    args = parser.parse_args()
+    report = run_benchmarks(args.rounds, args.calls, args.decks, args.players)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.tolerance)
+    text = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if report.get("regressions"):
+        for r in report["regressions"]:
+            print("{name} is {slowdown:.0%} slower than the baseline.".format(name = r["name"], slowdown = r["slowdown"]), file = sys.stderr)
+        sys.exit(1)
@@ -1,43 +1,81 @@
+import copy
+import itertools
 import random
+import sys
+from array import array
+from collections import namedtuple
+
+#Tags for the built-in card counting systems. Ranks that are left out count as 0, and J, Q, and K use the tag for 10 unless they have their own.
+count_systems = {
+    "Hi-Lo": {"2": 1, "3": 1, "4": 1, "5": 1, "6": 1, "10": -1, "A": -1},
+    "KO": {"2": 1, "3": 1, "4": 1, "5": 1, "6": 1, "7": 1, "10": -1, "A": -1},
+    "Omega II": {"2": 1, "3": 1, "4": 2, "5": 2, "6": 2, "7": 1, "9": -1, "10": -2},
+}
+
+#Deck lists already built, shared by every table with the same deck and number of decks. Keyed by the create_deck method, the deck type, and the deck count.
+base_decks = {}
 
 #GameState holds all the relevant information and functions related to the table as well as game rules that the user can adjust.
 class GameState:
-    shoe = []
-    shoe_value = 0
-    players_list = []
-
-    #These four values determine the maximum possible value of cards on the table, used to calculate the minimum end-of-round shoe value before adding decks.
-    max_dealer_hand = 26
-    max_player_hand = 30
     max_players = 5
     max_hands = 2
 
     decks = 1 #By default, the game is single-deck Blackjack.
-    deck_value = 0 #Ace value is counted as 1 for the purpose of shoe management.
+    penetration = 0.75 #Share of the shoe dealt before the cut card comes out and the dealer reshuffles.
     buy_in = 1000.00 #Also used for rebuys.
     casino_name = "Moonshadow Casino"
     surrender_allowed = True #By default, players can surrender half their bet on the first turn. Most casinos no longer allow this.
+    dealer_stands_on = 17 #The dealer hits until their hand reaches this total.
+    blackjack_payout = 1.5 #Blackjacks pay 3:2 by default. Some casinos pay 6:5 (1.2).
+    insurance_cost = 0.5 #Insurance costs this share of the initial bet and pays 2:1.
+    compact_shoe = False #Stores the shoe as small integers in a preallocated buffer instead of a list of Card objects. Useful for long simulations with large shoes.
+    history = None #A HandHistoryWriter (or anything with a record_round method) that is handed every round before the hands are cleared.
+    counting = () #Names of the count systems to track (see count_systems), or CardCounter objects for custom tag tables. A tuple so the default can never be changed for every table at once.
+    deck_type = None #The cards in one deck. Leaving this as None uses a StandardDeck. See SpanishDeck for a custom deck.
+    side_bets = () #SideBet objects offered at the table, such as TwentyOnePlusThree() and PerfectPairs(). Automated players bet on them through their strategy. A tuple so the default can never be changed for every table at once.
+    output = None #Where table messages go. Defaults to a TextSink, which prints them like the interactive game always has.
+    round_number = 0
 
-    def __init__(self):
-        self.deck_list = self.create_deck()
+    #Each table keeps its own shoe, players, and random number generator so that several tables can run in one process. Passing a seed makes every shuffle at the table reproducible.
+    #Any of the table rules above can be changed for this table only by passing them by name, such as GameState(decks = 6, blackjack_payout = 1.2).
+    def __init__(self, seed = None, **rules):
+        for rule, value in rules.items():
+            if not hasattr(GameState, rule):
+                raise TypeError("{rule} is not a table rule.".format(rule = rule))
+            setattr(self, rule, value)
+        self.rng = random.Random(seed)
+        if self.output is None:
+            self.output = TextSink()
+        self.shoe = []
+        self.discards = [] #The discard tray, shuffled back into the shoe when the cut card comes out.
+        self.players_list = []
         self.dealer = Player("Dealer", self)
+        self.counters = {}
+        for c in self.counting:
+            counter = copy.copy(c) if isinstance(c, CardCounter) else CardCounter(c, count_systems[c]) #Tables given the same CardCounter each get their own copy, so they never share a count.
+            counter.set_deck(self.deck_list, self.decks)
+            self.counters[counter.name] = counter
+        self.side_bet_tables = {bet.name: (bet, bet.compile(self.deck_list)) for bet in self.side_bets}
 
-    #While it would be possible to manually fill out a deck or pull from a file, this simplifies the process. This process also allows for users to create custom decks.
+    #The deck list and deck value (the total value of the deck list, Aces counted as 1) are looked up the first time they are used, so making a table costs almost nothing until it deals. The deck list is shared with other tables and is a tuple so it can't be changed by accident.
+    def __getattr__(self, name):
+        if name not in ("deck_list", "deck_value"):
+            raise AttributeError("'{cls}' object has no attribute '{name}'".format(cls = type(self).__name__, name = name))
+        deck_type = self.deck_type if self.deck_type is not None else StandardDeck()
+        key = (type(self).create_deck, deck_type.key(), self.decks)
+        if key not in base_decks:
+            base_decks[key] = (tuple(self.create_deck()), self.deck_value)
+        self.deck_list, self.deck_value = base_decks[key]
+        return getattr(self, name)
+
+    #While it would be possible to manually fill out a deck or pull from a file, this simplifies the process. Custom decks are made by setting deck_type.
     def create_deck(self):
-        base_deck = []
-        deck_list = []
-        suits = ["♠", "♥", "♣", "♦"]
-        ranks = ["A"]
+        deck_type = self.deck_type if self.deck_type is not None else StandardDeck()
+        base_deck = deck_type.cards()
         single_deck_value = 0
-        for n in range(2, 11):
-            ranks.append(str(n))
-        ranks.extend(["J", "Q", "K"])
-        for s in suits:
-            for r in ranks:
-                base_deck.append(Card(r, s))
-                single_deck_value += self.get_card_value(r) #340 with a standard deck.
-        for d in range(self.decks):
-            deck_list.extend(base_deck) #Provides a total deck list to be shuffled together every time the shoe runs low.
+        for c in base_deck:
+            single_deck_value += self.get_card_value(c.rank) #340 with a standard deck.
+        deck_list = base_deck * self.decks #Provides a total deck list to be shuffled together every time the shoe runs low.
         self.deck_value = self.decks * single_deck_value #Value of all cards in deck_list
         return deck_list
 
@@ -49,6 +87,10 @@ class GameState:
             return 1
         return int(rank)
 
+    #Sends a message about the table to the output sink. The message is a template and its fields rather than a finished string, so sinks that don't show text never pay for formatting.
+    def display(self, kind, template, **fields):
+        self.output.write(kind, template, fields)
+
     #Displays a welcome message for the players when they enter the casino.
     def display_welcome(self):
         welcome_message = "\033[96mWelcome to {casino}! Decks shuffled into the shoe: {decks}. Max players per table: {players}. Max number of hands per player: {hands}. Surrenders are \033[0m".format(casino = self.casino_name, decks = self.decks, players = self.max_players, hands = self.max_hands)
@@ -56,7 +98,7 @@ class GameState:
             welcome_message += "\033[96mallowed.\033[0m"
         else:
             welcome_message += "\033[96mnot allowed.\033[0m"
-        print(welcome_message)
+        self.display("welcome", welcome_message)
 
     #Creates an instance of the Player class for each player participating in the game and adds them to the list of players. Defaults the name to "Player X" (X being the player number) if the player does not enter a name.
     def create_players(self):
@@ -68,6 +110,12 @@ class GameState:
             else:
                 self.players_list.append(Player(pname, self))
 
+    #Seats a player without asking for input. Players seated with a strategy make all of their decisions through it instead of through input().
+    def add_player(self, name, strategy = None):
+        player = Player(name, self, strategy)
+        self.players_list.append(player)
+        return player
+
     #Gets the number of players that will be playing and verifies that the user inputs an actual number between 1 and max_players.
     def get_num_players(self):
         while True:
@@ -83,25 +131,42 @@ class GameState:
             except ValueError:
                 print("That's not a number.")
 
-    #Checks to see if the shoe has enough cards for a full round. If not, it calls add_to_shoe to add a deck (or set of decks) to the shoe with a message that changes depending on whether or not the shoe is empty when the dealer extends the shoe.
+    #Checks to see if the cut card has come out before the round starts. The first round fills the shoe, and after that the dealer shuffles the discard tray back into the shoe once the cards left reach the cut card.
     def check_shoe_size(self):
-        min_value = self.get_min_shoe()
-        while self.shoe_value < min_value:
-            if self.shoe_value > 0:
-                print("The dealer adds another deck to the shoe.")
-            else:
-                print("The dealer adds a deck to the shoe")
-            self.shoe_value += self.add_to_shoe() #Updates the total value of cards currently in the shoe.
+        if not self.shoe and not self.discards:
+            self.display("shoe", "The dealer adds a deck to the shoe")
+            self.add_to_shoe()
+        elif len(self.shoe) <= self.get_cut_card():
+            self.display("shoe", "The dealer reaches the cut card and reshuffles the shoe.")
+            self.reshuffle()
+
+    #Returns the number of cards left in the shoe when the cut card comes out.
+    def get_cut_card(self):
+        return int(len(self.deck_list) * (1 - self.penetration))
 
-    #Calculates the minimum value of cards needed for a full round based on the maximum number of hands and theoretical maximum value of those hands.
-    def get_min_shoe(self):
-        return self.max_dealer_hand + (len(self.players_list) * self.max_hands * self.max_player_hand)
+    #Shuffles the discard tray back into the cards left in the shoe. Cards still on the table stay out until the round is cleaned up.
+    def reshuffle(self):
+        for c in self.counters.values():
+            c.add_cards(self.discards)
+        if isinstance(self.shoe, CompactShoe):
+            self.shoe.reshuffle(self.discards, self.rng)
+        else:
+            self.shoe.extend(self.discards)
+            self.rng.shuffle(self.shoe)
+        self.discards.clear()
 
-    #Adds a newly shuffled deck(s) to the shoe, moving the old deck(s) to the end of the list to ensure that every card from the deck(s) is dealt before the first card of the new deck(s) is dealt.
+    #Adds a newly shuffled deck(s) to the shoe, moving the old deck(s) to the end of the list to ensure that every card from the deck(s) is dealt before the first card of the new deck(s) is dealt. Fills the shoe for the first round; after that the discard tray is reshuffled instead.
     def add_to_shoe(self):
+        for c in self.counters.values():
+            c.add_decks()
+        if self.compact_shoe:
+            if not isinstance(self.shoe, CompactShoe):
+                self.shoe = CompactShoe(self.deck_list, self.shoe)
+            self.shoe.add_decks(self.rng)
+            return self.deck_value
         old_deck = self.shoe
-        new_deck = self.deck_list.copy()
-        random.shuffle(new_deck)
+        new_deck = list(self.deck_list)
+        self.rng.shuffle(new_deck)
         self.shoe = new_deck + old_deck
         return self.deck_value
 
@@ -120,12 +185,16 @@ class GameState:
                 p.hands[0].check_blackjack()
             self.dealer.show_upcard()
             self.dealer.hands[0].check_blackjack()
-            print("-------------------------------------------------") #Provides a break between showing the initial board state to the players and the individual players' actions in order to avoid confusion.
+            if self.side_bet_tables:
+                self.settle_side_bets()
+            self.display("separator", "-------------------------------------------------") #Provides a break between showing the initial board state to the players and the individual players' actions in order to avoid confusion.
 
     #Handles player betting inputs for their initial hands as well as giving them the option to leave.
     def handle_betting(self):
         players_to_remove = []
         for p in self.players_list:
+            if p.strategy is not None:
+                p.hands[0].bet = p.strategy_bet()
             while p.hands[0].bet == 0:
                 binput = input("{player} has ${money} remaining. How much will {player} bet? Enter 0 or \"leave\" to leave. ".format(player = p.name, money = p.bankroll))
                 p.hands[0].bet = p.betting(binput)
@@ -133,22 +202,51 @@ class GameState:
                 players_to_remove.append(p)
             else:
                 p.bankroll -= p.hands[0].bet
+                if self.side_bet_tables and p.strategy is not None:
+                    self.place_side_bets(p)
         return players_to_remove
 
+    #Takes each side bet the player's strategy wants, as long as the player can cover it.
+    def place_side_bets(self, player):
+        for bet, payouts in self.side_bet_tables.values():
+            amount = min(player.strategy.get_side_bet(bet.name, player, self), player.bankroll)
+            if amount > 0:
+                player.bankroll -= amount
+                player.side_bets[bet.name] = amount
+
+    #Side bets are settled as soon as the first cards are dealt. Each is a single lookup in the bet's payout table.
+    def settle_side_bets(self):
+        for p in self.players_list:
+            for name, amount in p.side_bets.items():
+                bet, payouts = self.side_bet_tables[name]
+                odds = payouts.lookup(bet.cards_for(p, self))
+                if odds > 0:
+                    p.bankroll += amount * (1 + odds)
+                    self.display("side_bet_win", "{player} wins ${amount} on {bet}!", player = p.name, amount = amount * odds, bet = name)
+                else:
+                    self.display("side_bet_lose", "{player} loses their ${amount} {bet} bet.", player = p.name, amount = amount, bet = name)
+
     def remove_player(self, players_to_remove):
         for r in players_to_remove:
             self.players_list.remove(r)
 
     def starter_hands(self):
         for p in self.players_list:
-            p.hands.append(Hand(1, p))
-        self.dealer.hands.append(Hand(1, self.dealer))
+            p.hands.append(p.new_hand(1))
+        self.dealer.hands.append(self.dealer.new_hand(1))
 
     #Deals a card to the player's hand, removing it from the shoe and updating the relevant information in the hand.
     def deal_cards(self, hand):
-        if not self.shoe: #The shoe should never be empty, but if players reduce the max_hand variables or improperly calculate max hand value for custom games, this check could be necessary.
-            self.add_to_shoe()
+        if not self.shoe: #The shoe can run out mid-round with a deep cut card and a full table. Like a real dealer, the discard tray is shuffled to finish the round.
+            if self.discards:
+                self.display("shoe", "The shoe is empty. The dealer shuffles the discards to finish the round.")
+                self.reshuffle()
+            else:
+                self.add_to_shoe()
         new_card = self.shoe.pop()
+        if self.counters:
+            for c in self.counters.values():
+                c.remaining_tags -= c.tags[new_card.rank]
         hand.cards.append(new_card)
         if new_card.rank == "A":
             hand.soft_aces += 1
@@ -164,20 +262,23 @@ class GameState:
             else:
                 print("It's a yes or no question.")
 
-    #Offers the players the ability to buy insurance if the dealer is showing an Ace. Insurance bets are always half the initial bet (varies by casino).
+    #Offers the players the ability to buy insurance if the dealer is showing an Ace. Insurance bets are half the initial bet by default (varies by casino, see insurance_cost).
     def check_insurance(self):
         for p in self.players_list:
-            if p.bankroll >= p.hands[0].bet / 2:
-                choice = self.get_yes_or_no("Would {player} like to buy insurance? ".format(player = p.name))
+            if p.bankroll >= p.hands[0].bet * self.insurance_cost:
+                if p.strategy is not None:
+                    choice = "yes" if p.strategy.take_insurance(p, self) else "no"
+                else:
+                    choice = self.get_yes_or_no("Would {player} like to buy insurance? ".format(player = p.name))
                 if choice in ["yes", "y"]:
                     p.hasInsurance = True
-                    p.bankroll -= p.hands[0].bet / 2
+                    p.bankroll -= p.hands[0].bet * self.insurance_cost
             else:
-                print("{player} does not have the funds to buy insurance.".format(player = p.name))
+                self.display("insurance", "{player} does not have the funds to buy insurance.", player = p.name)
         if self.dealer.hands[0].isBlackjack:
             self.dealer.dealer_blackjack(self)
         else:
-            print("The dealer does not have blackjack. The round continues.")
+            self.display("dealer_checks", "The dealer does not have blackjack. The round continues.")
 
     #The dealer checks their hole card if they might have a blackjack.
     def dealer_start_round_checks(self):
@@ -195,17 +296,26 @@ class GameState:
                 if h.firstTurn:
                     h.print_hand()
                     if h.isBlackjack:
-                        print("\033[32m{player} has a blackjack!\033[0m".format(player = player.name))
+                        self.display("blackjack", "\033[32m{player} has a blackjack!\033[0m", player = player.name)
                         h.locked = True
                     else:
                         #Shows the dealer's upcard at the start of each player's turn so they can make informed decisions without having to scroll up to the outcome of the initial deal.
                         self.dealer.show_upcard()
                 if not h.isBlackjack:
                     valid_options = h.create_action_list(self) #Creates a list of valid options based on the current state of the hand.
-                    player_message = h.create_message(valid_options) #Creates a message for the player based on the player's available actions.
-                    player_action = player.get_player_input(valid_options, player_message) #Gets the player's choice
+                    if player.strategy is not None:
+                        player_action = self.strategy_action(player, h, valid_options)
+                        if player_action not in valid_options: #The human path checks its input, and an action the hand can't take would otherwise overdraw the bankroll or never end the turn.
+                            raise ValueError("{player} can't {action} on {hand}. Allowed: {valid}.".format(player = player.name, action = player_action, hand = h, valid = ", ".join(valid_options)))
+                    else:
+                        player_message = h.create_message(valid_options) #Creates a message for the player based on the player's available actions.
+                        player_action = player.get_player_input(valid_options, player_message) #Gets the player's choice
                     h.resolve_action(player_action, self) #Executes the player's choice
 
+    #Asks a player's strategy for their action. Strategy objects can be shared by many tables, so anything that needs to watch one table's decisions wraps this method on that table.
+    def strategy_action(self, player, hand, valid_options):
+        return player.strategy.choose_action(hand, valid_options, self)
+
     #Checks to see if all players have busted out (and thus the dealer's turn can be skipped)
     def bust_check(self):
         for p in self.players_list:
@@ -220,65 +330,370 @@ class GameState:
             for h in p.hands:
                 h.settle(self.dealer)
 
-    #Handles end-of-round cleanup, removing players from the game who have gone broke, clearing out player hands, and subtracting the total value of cards dealt to players this round from the value of cards in the shoe.
+    #Handles end-of-round cleanup, removing players from the game who have gone broke, clearing out player hands, and moving the cards on the table to the discard tray.
     def round_cleanup(self):
+        if self.history is not None:
+            self.history.record_round(self)
         players_to_remove = []
-        hands_total = 0
         for p in self.players_list:
             for h in p.hands:
-                hands_total += h.total
+                self.discards.extend(h.cards)
             p.clear_round() #Resets player information to default and clears out their hands.
             if p.bankroll < 1:
-                choice = self.get_yes_or_no("{player} has gone broke. Rebuy? ".format(player = p.name))
+                if p.strategy is not None:
+                    choice = "yes" if p.strategy.rebuy(p, self) else "no"
+                else:
+                    choice = self.get_yes_or_no("{player} has gone broke. Rebuy? ".format(player = p.name))
                 if choice in ["yes", "y"]:
-                    print("{player} rebuys into the game for ${amount}.".format(player = p.name, amount = self.buy_in))
+                    self.display("rebuy", "{player} rebuys into the game for ${amount}.", player = p.name, amount = self.buy_in)
                     p.bankroll += self.buy_in
                 else:
-                    print("{player} leaves the table after going broke.".format(player = p.name))
+                    self.display("leave", "{player} leaves the table after going broke.", player = p.name)
                     players_to_remove.append(p)
         self.remove_player(players_to_remove) #Removes players that have gone broke.
-        hands_total += self.dealer.hands[0].total
+        self.discards.extend(self.dealer.hands[0].cards)
         self.dealer.clear_round() #Clears the dealer's hand and sets it back to default.
-        self.shoe_value -= hands_total #Updates the total value of cards left in the shoe to determine if a new deck needs to be added.
+
+    #Returns the running count for one of the tracked count systems.
+    def get_running_count(self, name = "Hi-Lo"):
+        return self.counters[name].running_count()
+
+    #Returns the running count divided by the number of decks left in the shoe.
+    def get_true_count(self, name = "Hi-Lo"):
+        decks_left = len(self.shoe) * self.decks / len(self.deck_list)
+        if decks_left == 0:
+            return 0.0
+        return self.counters[name].running_count() / decks_left
+
+    #Plays a single round from the shoe check to the cleanup. Returns False if every player left the table before the cards were dealt.
+    def play_round(self):
+        self.check_shoe_size() #If there is a risk the current shoe will empty mid-round, adds decks to the shoe.
+        self.initial_deal() #Betting and initial round of cards.
+        if len(self.players_list) == 0: #Ends the game if all players choose to leave the table.
+            return False
+        if self.dealer_start_round_checks(): #Dealer checks their hole card if they have an Ace or 10-value as their upcard. Skips the round if the dealer has a blackjack.
+            for p in self.players_list:
+                self.player_turn(p)
+            self.dealer.dealer_turn(self)
+            self.settle_round()
+        self.round_cleanup() #Clears hands and round-specific data
+        self.round_number += 1
+        return True
+
+    #Runs the table without any input for up to the given number of rounds, stopping early if every player leaves. Every seated player needs a strategy. Printing is switched off, but other sinks are kept so a simulation can still buffer text or collect events. Returns the number of rounds played.
+    def simulate(self, rounds):
+        if type(self.output) is TextSink:
+            self.output = NullSink()
+        played = 0
+        while played < rounds and len(self.players_list) > 0:
+            if not self.play_round():
+                break
+            played += 1
+        return played
 
     def __repr__(self):
-        return "Casino name: {casino_name}, Base deck: {deck}, Total card value in base deck (A at 1): {deck_value}, current shoe: {shoe}, shoe value at start of hand: {shoe_value}, active players: {players}.\nCasino rules:\nNumber of decks: {decks}\nMax players: {max_players}\nMax hands per player: {max_hands}\nSurrenders allowed: {surrender}".format(casino_name = self.casino_name, deck = self.deck_list, deck_value = self.deck_value, shoe = self.shoe, shoe_value = self.shoe_value, players = self.players_list, decks = self.decks, max_players = self.max_players, max_hands = self.max_hands, surrender = str(self.surrender_allowed))
+        return "Casino name: {casino_name}, Base deck: {deck}, Total card value in base deck (A at 1): {deck_value}, current shoe: {shoe}, cards left before the cut card: {cut}, active players: {players}.\nCasino rules:\nNumber of decks: {decks}\nMax players: {max_players}\nMax hands per player: {max_hands}\nSurrenders allowed: {surrender}".format(casino_name = self.casino_name, deck = self.deck_list, deck_value = self.deck_value, shoe = self.shoe, cut = len(self.shoe) - self.get_cut_card(), players = self.players_list, decks = self.decks, max_players = self.max_players, max_hands = self.max_hands, surrender = str(self.surrender_allowed))
+
+#Output sinks receive every table message as a kind, a template, and the fields for the template.
+#TextSink prints each message as it comes, which is how the interactive game has always looked.
+class TextSink:
+    def write(self, kind, template, fields):
+        print(template.format(**fields) if fields else template)
+
+#NullSink drops every message without formatting it, for headless runs.
+class NullSink:
+    def write(self, kind, template, fields):
+        pass
+
+#BufferedTextSink formats the messages but writes them out in blocks instead of one print per message.
+class BufferedTextSink:
+    def __init__(self, stream = None, block_lines = 1000):
+        self.stream = stream if stream is not None else sys.stdout
+        self.block_lines = block_lines
+        self.lines = []
+
+    def write(self, kind, template, fields):
+        self.lines.append(template.format(**fields) if fields else template)
+        if len(self.lines) >= self.block_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.stream.write("\n".join(self.lines) + "\n")
+            self.lines = []
+        self.stream.flush()
+
+#EventSink keeps each message as an OutputEvent with its kind and fields instead of text. Objects like hands and cards are turned into strings as the event is made, since they change as the round goes on. Passing a callback sends each event there instead of keeping it.
+class EventSink:
+    def __init__(self, callback = None):
+        self.callback = callback
+        self.events = []
+
+    def write(self, kind, template, fields):
+        event = OutputEvent(kind, {k: v if isinstance(v, (int, float, str)) else str(v) for k, v in fields.items()})
+        if self.callback is not None:
+            self.callback(event)
+        else:
+            self.events.append(event)
+
+OutputEvent = namedtuple("OutputEvent", ["kind", "fields"])
 
 #The Card class holds relevant information about each card in the deck.
+#Cards can't be changed once made, so there is only ever one Card for each rank and suit. Card("A", "♠") always gives back the same object, and every deck, shoe, and table shares it.
 class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit #In standard rules, this is irrelevant. But users may want to make custom rules (such as a suited blackjack paying 3x or a custom "3 card flush" side bet) or utilize the Card class for games where a card's suit is relevant.
-        self.card = rank + suit
-        if rank in "AJQK":
-            if rank == "A":
-                self.value = 11
+    __slots__ = ("rank", "suit", "value")
+    interned = {}
+
+    def __new__(cls, rank, suit):
+        card = Card.interned.get((cls, rank, suit))
+        if card is None:
+            card = object.__new__(cls)
+            object.__setattr__(card, "rank", rank)
+            object.__setattr__(card, "suit", suit) #In standard rules, this is irrelevant. But users may want to make custom rules (such as a suited blackjack paying 3x or a custom "3 card flush" side bet) or utilize the Card class for games where a card's suit is relevant.
+            if rank in "AJQK":
+                if rank == "A":
+                    value = 11
+                else:
+                    value = 10
             else:
-                self.value = 10
-        else:
-            self.value = int(rank)
-        
+                value = int(rank)
+            object.__setattr__(card, "value", value)
+            Card.interned[(cls, rank, suit)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards can't be changed.")
+
+    #Unpickled cards come back as the shared Card for their rank and suit.
+    def __reduce__(self):
+        return (type(self), (self.rank, self.suit))
+
     def __str__(self):
-        return self.card
+        return self.rank + self.suit
 
     def __repr__(self):
         if self.rank != "A":
-            return "{card} has a value of {value}.".format(card = self.card, value = self.value)
+            return "{card} has a value of {value}.".format(card = self, value = self.value)
         else:
-            return "{card} has a maximum value of {value}, but can be demoted to a value of 1.".format(card = self.card, value = self.value)
+            return "{card} has a maximum value of {value}, but can be demoted to a value of 1.".format(card = self, value = self.value)
+
+#Deck types list the ranks and suits in one deck. GameState.create_deck builds the deck list from the table's deck_type, so a custom deck is a subclass with its own ranks or suits, or its own cards method.
+class StandardDeck:
+    suits = ["♠", "♥", "♣", "♦"]
+    ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+
+    def cards(self):
+        return [Card(r, s) for s in self.suits for r in self.ranks]
+
+    #Decks with the same key have the same cards. Subclasses that change cards() without changing ranks or suits need their own key.
+    def key(self):
+        return (type(self), tuple(self.suits), tuple(self.ranks))
+
+#Spanish 21 decks have no 10s, leaving J, Q, and K as the only ten-value cards.
+class SpanishDeck(StandardDeck):
+    ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "J", "Q", "K"]
+
+#Every payout for one side bet, worked out ahead of time for every possible set of cards from a deck. Cards are numbered by their place among the distinct Cards in the deck list, and a set of cards is looked up by reading those numbers as the digits of its index in the table.
+class PayoutTable:
+    def __init__(self, bet, deck_list):
+        distinct = list(dict.fromkeys(deck_list))
+        self.codes = {c: i for i, c in enumerate(distinct)}
+        self.size = len(distinct)
+        self.table = array("d", (bet.payout(cards) for cards in itertools.product(distinct, repeat = bet.card_count))) #Doubles, so odds like 1.2 pay exactly what payout returns.
+
+    #Returns the payout odds for the cards, 0 if the bet loses.
+    def lookup(self, cards):
+        key = 0
+        for c in cards:
+            key = key * self.size + self.codes[c]
+        return self.table[key]
+
+#Side bets pay out on the first cards dealt. Subclasses give the bet a name, the number of cards it looks at, which cards those are, and the odds it pays for a set of cards. payout is only called while the payout table is compiled, so it can be as slow and readable as it likes. Payout tables are shared by every table with the same bet and deck.
+class SideBet:
+    name = "Side bet"
+    card_count = 2
+    paytable = {}
+    compiled = {}
+
+    #The player's first two cards by default.
+    def cards_for(self, player, game):
+        return player.hands[0].cards[:self.card_count]
+
+    #Returns the payout odds for the cards, 0 if the bet loses.
+    def payout(self, cards):
+        return 0
+
+    def compile(self, deck_list):
+        key = (type(self), tuple(sorted(self.paytable.items())), tuple(dict.fromkeys(deck_list)))
+        if key not in SideBet.compiled:
+            SideBet.compiled[key] = PayoutTable(self, deck_list)
+        return SideBet.compiled[key]
+
+#21+3 makes a poker hand from the player's first two cards and the dealer's upcard. Aces count high or low in a straight.
+class TwentyOnePlusThree(SideBet):
+    name = "21+3"
+    card_count = 3
+    paytable = {"suited trips": 100, "straight flush": 40, "three of a kind": 30, "straight": 10, "flush": 5}
+    rank_order = {r: i + 1 for i, r in enumerate(StandardDeck.ranks)}
+
+    def cards_for(self, player, game):
+        return player.hands[0].cards[:2] + game.dealer.hands[0].cards[:1]
+
+    def payout(self, cards):
+        flush = len({c.suit for c in cards}) == 1
+        trips = len({c.rank for c in cards}) == 1
+        values = sorted(self.rank_order[c.rank] for c in cards)
+        straight = (values[1] == values[0] + 1 and values[2] == values[1] + 1) or values == [1, 12, 13]
+        if trips and flush:
+            return self.paytable["suited trips"]
+        if straight and flush:
+            return self.paytable["straight flush"]
+        if trips:
+            return self.paytable["three of a kind"]
+        if straight:
+            return self.paytable["straight"]
+        if flush:
+            return self.paytable["flush"]
+        return 0
+
+#Perfect Pairs pays when the player's first two cards are a pair, paying more when they share a color and most when they share a suit.
+class PerfectPairs(SideBet):
+    name = "Perfect Pairs"
+    paytable = {"perfect pair": 25, "colored pair": 12, "mixed pair": 6}
+    red_suits = ["♥", "♦"]
+
+    def payout(self, cards):
+        first, second = cards
+        if first.rank != second.rank:
+            return 0
+        if first.suit == second.suit:
+            return self.paytable["perfect pair"]
+        if (first.suit in self.red_suits) == (second.suit in self.red_suits):
+            return self.paytable["colored pair"]
+        return self.paytable["mixed pair"]
+
+#The CardCounter class keeps a running count for one count system. Instead of adding up the cards that have been seen, it tracks the total tag of the cards still in the shoe, which only changes by one tag per dealt card and by a full set of decks when the shoe is extended.
+#The running count is the tag total of one deck minus the tag total left in the shoe. For balanced systems like Hi-Lo the tag total of one deck is 0, and for unbalanced systems like KO this gives the usual starting count of 4 - 4 * decks for a fresh shoe.
+class CardCounter:
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = {}
+        for r in ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]:
+            self.tags[r] = tags.get(r, tags.get("10", 0) if r in "JQK" else 0)
+        self.deck_tags = 0 #Tag total of a single deck.
+        self.shoe_tags = 0 #Tag total of the full deck list added each time the shoe is extended.
+        self.remaining_tags = 0 #Tag total of the cards still in the shoe.
+
+    def set_deck(self, deck_list, decks):
+        self.shoe_tags = sum(self.tags[c.rank] for c in deck_list)
+        self.deck_tags = self.shoe_tags // decks #The deck list is always a whole number of copies of one deck.
+
+    def add_decks(self):
+        self.remaining_tags += self.shoe_tags
+
+    #Adds cards returned to the shoe, such as the discard tray when it is reshuffled.
+    def add_cards(self, cards):
+        for c in cards:
+            self.remaining_tags += self.tags[c.rank]
+
+    def running_count(self):
+        return self.deck_tags - self.remaining_tags
+
+#The CompactShoe class stores the shoe as card codes in a preallocated array with a dealing cursor. Each distinct Card in the deck list gets one code, and dealing hands out that shared Card instead of storing a Card for every position in the shoe.
+#It behaves like the list shoe for the parts of GameState that use it: len() for the remaining cards and pop() to deal the next card.
+class CompactShoe:
+    def __init__(self, deck_list, old_shoe = None):
+        self.card_table = [] #Maps each code back to its Card.
+        self.codes = {} #Maps the id of each distinct Card to its code.
+        self.deck_codes = []
+        for c in deck_list:
+            if id(c) not in self.codes:
+                self.codes[id(c)] = len(self.card_table)
+                self.card_table.append(c)
+            self.deck_codes.append(self.codes[id(c)])
+        self.typecode = "B" if len(self.card_table) <= 256 else "H"
+        self.buffer = array(self.typecode, bytes(array(self.typecode).itemsize * 2 * len(self.deck_codes))) #Room for a full set of decks plus the leftovers of the previous set.
+        self.cursor = 0 #Position of the next card to deal.
+        self.end = 0 #Position after the last card in the shoe.
+        if old_shoe: #Keeps any cards already in a list shoe, which are dealt before the new cards. The list shoe deals from the end.
+            for c in reversed(old_shoe):
+                if id(c) not in self.codes:
+                    self.codes[id(c)] = len(self.card_table)
+                    self.card_table.append(c)
+                self.buffer[self.end] = self.codes[id(c)]
+                self.end += 1
+
+    #Shuffles a fresh set of decks in behind the cards still in the shoe, so every remaining card is dealt before the first card of the new decks. The remaining cards are moved to the front of the buffer instead of building a new shoe.
+    def add_decks(self, rng):
+        remaining = self.end - self.cursor
+        needed = remaining + len(self.deck_codes)
+        if needed > len(self.buffer):
+            self.buffer.extend(array(self.typecode, bytes(self.buffer.itemsize * (needed - len(self.buffer)))))
+        if self.cursor > 0:
+            self.buffer[0:remaining] = self.buffer[self.cursor:self.end]
+        new_deck = self.deck_codes.copy()
+        rng.shuffle(new_deck)
+        new_deck.reverse() #The list shoe deals from the end, so reversing keeps the same dealing order for the same random state.
+        self.buffer[remaining:needed] = array(self.typecode, new_deck)
+        self.cursor = 0
+        self.end = needed
+
+    #Shuffles the discarded cards in with the cards left in the shoe. The cards are combined in the same order as the list shoe so the same random state gives the same shuffle.
+    def reshuffle(self, discards, rng):
+        cards = list(reversed(self.buffer[self.cursor:self.end]))
+        cards.extend(self.codes[id(c)] for c in discards)
+        rng.shuffle(cards)
+        cards.reverse()
+        if len(cards) > len(self.buffer):
+            self.buffer.extend(array(self.typecode, bytes(self.buffer.itemsize * (len(cards) - len(self.buffer)))))
+        self.buffer[0:len(cards)] = array(self.typecode, cards)
+        self.cursor = 0
+        self.end = len(cards)
+
+    #Deals the next card.
+    def pop(self):
+        if self.cursor >= self.end:
+            raise IndexError("pop from empty shoe")
+        code = self.buffer[self.cursor]
+        self.cursor += 1
+        return self.card_table[code]
+
+    #Rebuilds the remaining cards as a list in dealing order. Only needed for display.
+    def cards(self):
+        return [self.card_table[code] for code in self.buffer[self.cursor:self.end]]
+
+    def __len__(self):
+        return self.end - self.cursor
+
+    def __repr__(self):
+        return str(self.cards())
 
 #The Player class holds all the relevant information and functions related to individual players as well as to the dealer.
 class Player:
-    def __init__(self, name, game):
+    __slots__ = ("name", "game", "bankroll", "hands", "hasInsurance", "strategy", "spare_hands", "side_bets")
+
+    def __init__(self, name, game, strategy = None):
         self.name = name
+        self.game = game
         self.bankroll = game.buy_in
         self.hands = []
+        self.spare_hands = [] #Hands from earlier rounds, kept to be reset and reused instead of making new ones every round.
+        self.side_bets = {} #Side bet amounts for the current round, by side bet name.
         self.hasInsurance = False
+        self.strategy = strategy #Automated players make their decisions through a Strategy. Human players leave this as None and are asked through input().
+
+    #Gets the bet for the initial hand from the player's strategy, returns -1 if the strategy chooses to leave the table. Bets larger than the bankroll are cut down to what the player has left.
+    def strategy_bet(self):
+        bet_amount = min(self.strategy.get_bet(self, self.game), self.bankroll)
+        if bet_amount <= 0:
+            self.game.display("leave", "{player} left the table with ${money} remaining.", player = self.name, money = self.bankroll)
+            return -1
+        return bet_amount
 
     #Validates a player's bet for their initial hand, returns -1 if they choose to leave the table.
     def betting(self, bet_string):
         if bet_string.lower().strip() == "leave":
-            print("{player} left the table with ${money} remaining.".format(player = self.name, money = self.bankroll))
+            self.game.display("leave", "{player} left the table with ${money} remaining.", player = self.name, money = self.bankroll)
             return -1
         elif bet_string.isnumeric():
             bet_amount = int(bet_string)
@@ -286,7 +701,7 @@ class Player:
                 print("You don't have that much left!")
                 return 0
             elif bet_amount == 0:
-                print("{player} left the table with ${money} remaining.".format(player = self.name, money = self.bankroll))
+                self.game.display("leave", "{player} left the table with ${money} remaining.", player = self.name, money = self.bankroll)
                 return -1
             else:
                 return bet_amount
@@ -296,28 +711,28 @@ class Player:
 
     #Shows the dealer's upcard.
     def show_upcard(self):
-        print("Dealer's upcard: {upcard}".format(upcard = self.hands[0].cards[0]))
+        self.game.display("upcard", "Dealer's upcard: {upcard}", upcard = self.hands[0].cards[0])
 
     #Handles payouts if the dealer has a blackjack.
     def dealer_blackjack(self, game):
         game.dealer.hands[0].print_hand()
-        print("The dealer has blackjack!")
+        self.game.display("dealer_blackjack", "The dealer has blackjack!")
         for p in game.players_list:
             if p.hands[0].isBlackjack:
-                message = "{player} has blackjack!".format(player = p.name)
+                p.hands[0].outcome = "push"
                 if p.hasInsurance:
-                    message += " {player}'s hand is a push, but their insurance bet pays off.".format(player = p.name)
-                    p.bankroll += p.hands[0].bet * 2.5
+                    self.game.display("push", "{player} has blackjack! {player}'s hand is a push, but their insurance bet pays off.", player = p.name)
+                    p.bankroll += p.hands[0].bet * (1 + 3 * game.insurance_cost) #The pushed bet back, plus the insurance bet and its 2:1 payout.
                 else:
-                    message += " The hand is a push."
+                    self.game.display("push", "{player} has blackjack! The hand is a push.", player = p.name)
                     p.bankroll += p.hands[0].bet
-                print(message)
             else:
+                p.hands[0].outcome = "lose"
                 if p.hasInsurance:
-                    print("{player}'s insurance bet pays off.".format(player = p.name))
-                    p.bankroll += p.hands[0].bet * 1.5
+                    self.game.display("insurance", "{player}'s insurance bet pays off.", player = p.name)
+                    p.bankroll += p.hands[0].bet * 3 * game.insurance_cost
                 else:
-                    print("{player} loses.".format(player = p.name))
+                    self.game.display("lose", "{player} loses.", player = p.name)
 
     #Gets and validates a player's input for the action they wish to take.
     def get_player_input(self, action_list, message):
@@ -331,13 +746,13 @@ class Player:
     #Determines if a player can split, exists for redundant checks at the start of the split() function.
     def can_split(self, hand, game):
         if self.bankroll < hand.bet:
-            print("Not enough funds!")
+            self.game.display("split_refused", "Not enough funds!")
             return False
         if hand.cards[0].rank != hand.cards[1].rank:
-            print("Hand cannot be split!")
+            self.game.display("split_refused", "Hand cannot be split!")
             return False
         if len(self.hands) >= game.max_hands:
-            print("{player} cannot have any more hands!".format(player = self.name))
+            self.game.display("split_refused", "{player} cannot have any more hands!", player = self.name)
             return False
         return True
 
@@ -346,7 +761,7 @@ class Player:
         if not self.can_split(current_hand, game): #This should never return False, but exists for redundancy.
             return
         splitting_hands = [current_hand] #List of the hands being adjusted in the function.
-        splitting_hands.append(Hand((len(self.hands) + 1), self))
+        splitting_hands.append(self.new_hand(len(self.hands) + 1))
         self.hands.append(splitting_hands[1])
         self.bankroll -= splitting_hands[0].bet
         splitting_hands[1].bet = splitting_hands[0].bet
@@ -363,14 +778,14 @@ class Player:
             h.print_hand()
             h.check_blackjack()
 
-    #Handles the dealer turn logic. Future versions will have customizeable dealer stand values.
+    #Handles the dealer turn logic. The dealer hits until reaching the table's dealer_stands_on value.
     def dealer_turn(self, game):
         valid_game = game.bust_check()
         if valid_game:
             self.hands[0].print_hand()
             while not self.hands[0].locked:
-                if self.hands[0].total < 17:
-                    print("Dealer takes a card.")
+                if self.hands[0].total < game.dealer_stands_on:
+                    self.game.display("dealer_hit", "Dealer takes a card.")
                     self.hands[0].hit(game)
                 else:
                     self.hands[0].stand()
@@ -378,8 +793,16 @@ class Player:
     #Resets round-specific variables to their defaults.
     def clear_round(self):
         self.hasInsurance = False
+        self.side_bets.clear()
+        self.spare_hands.extend(self.hands)
         self.hands = []
 
+    #Returns a fresh hand for this player, reusing a spare one if there is one.
+    def new_hand(self, id):
+        if self.spare_hands:
+            return self.spare_hands.pop().reset(id)
+        return Hand(id, self)
+
     def __str__(self):
         return self.name
 
@@ -388,10 +811,18 @@ class Player:
 
 #The Hand class holds all the relevant information and functions related to each players' hands.
 class Hand:
+    __slots__ = ("player", "id", "cards", "total", "soft_aces", "bet", "locked", "firstTurn", "isBlackjack", "isBust", "actions", "outcome")
+
     def __init__(self, id, player):
         self.player = player #The player playing the hand, important for some functions.
-        self.id = id #If the player has more than one hand, this differentiates between the multiple hands.
         self.cards = []
+        self.actions = [] #Every action taken on the hand, in order.
+        self.reset(id)
+
+    #Sets the hand back to an empty hand with no bet so it can be used again. Returns the hand.
+    def reset(self, id):
+        self.id = id #If the player has more than one hand, this differentiates between the multiple hands.
+        self.cards.clear()
         self.total = 0
         self.soft_aces = 0 #The number of soft Aces in a hand. When an Ace goes from a soft Ace (11 value) to a hard Ace (1 value), this is reduced.
         self.bet = 0
@@ -399,6 +830,9 @@ class Hand:
         self.firstTurn = True #Double, split, and surrender are only available on the first turn, and only a first turn hand can be a blackjack.
         self.isBlackjack = False
         self.isBust = False #Automatic loss
+        self.actions.clear()
+        self.outcome = None #Set when the hand is settled: "blackjack", "win", "push", "lose", "bust", or "surrender".
+        return self
 
     #Turns a soft Ace (11 value) into a hard Ace (1 value) if the player's hand is over 21 and they have a soft Ace.
     def demote_ace(self):
@@ -414,9 +848,9 @@ class Hand:
     #Shows the player hand. If the player has more than one hand, it differentiates between the two with the hand ID.
     def print_hand(self):
         if len(self.player.hands) > 1:
-            print("{player}'s hand {id}: {hand}".format(player = self.player.name, id = self.id, hand = self))
+            self.player.game.display("hand", "{player}'s hand {id}: {hand}", player = self.player.name, id = self.id, hand = self)
         else:
-            print("{player}'s hand: {hand}".format(player = self.player.name, hand = self))
+            self.player.game.display("hand", "{player}'s hand: {hand}", player = self.player.name, hand = self)
 
     #Creates a list of valid actions for a particular hand.
     def create_action_list(self, game):
@@ -448,21 +882,22 @@ class Hand:
     def resolve_action(self, action, game):
         if self.firstTurn and action != "split": #Makes doubling, splitting, and surrendering invalid after a hand's first turn. Replace with a len(cards) check in future versions. These are valid actions after splitting, however.
             self.firstTurn = False
+        self.actions.append(action)
         if action == "hit":
-            print("{player} takes a card.".format(player = self.player.name))
+            self.player.game.display("hit", "{player} takes a card.", player = self.player.name)
             self.hit(game)
         elif action == "stand":
             self.stand()
         elif action == "double":
-            print("{player} doubles down, risking it all on one more card!".format(player = self.player.name))
+            self.player.game.display("double", "{player} doubles down, risking it all on one more card!", player = self.player.name)
             self.doubling(game)
         elif action == "split":
             self.player.split(self, game)
         elif action == "surrender":
-            print("{player} surrenders, forfeiting ${half}.".format(player = self.player.name, half = (self.bet / 2)))
+            self.player.game.display("surrender", "{player} surrenders, forfeiting ${half}.", player = self.player.name, half = (self.bet / 2))
             self.surrender()
         else:
-            print("Error")
+            self.player.game.display("error", "Error")
 
     #Handles hitting.
     def hit(self, game):
@@ -473,16 +908,16 @@ class Hand:
                 if self.total > 21:
                     self.locked = True
                     self.isBust = True
-                    print("\033[31m{player} busts out!\033[0m".format(player = self.player))
+                    self.player.game.display("bust", "\033[31m{player} busts out!\033[0m", player = self.player.name)
                 else:
                     self.stand()
         else:
             self.print_hand()
-            if self.total >= 17: #Dealer stands at 17.
+            if self.total >= game.dealer_stands_on: #Dealer stands at 17 by default.
                 if self.total > 21:
                     self.locked = True
                     self.isBust = True
-                    print("\033[32mDealer busts! All players win!\033[0m")
+                    self.player.game.display("dealer_bust", "\033[32mDealer busts! All players win!\033[0m")
                 else:
                     self.stand()
 
@@ -498,12 +933,13 @@ class Hand:
     def surrender(self):
         self.player.bankroll += self.bet / 2
         self.bet = self.bet / 2
+        self.outcome = "surrender"
         self.locked = True
         self.isBust = True #A surrender is technically a player declaring their hand to be "bust" before exceeding 21.
 
     #Locks the hand and gives the hand value.
     def stand(self):
-        print("\033[34m{player} stands at {total}.\033[0m".format(player = self.player.name, total = self.total))
+        self.player.game.display("stand", "\033[34m{player} stands at {total}.\033[0m", player = self.player.name, total = self.total)
         self.locked = True
 
     #Settles the bets for each hand.
@@ -511,36 +947,42 @@ class Hand:
         self.print_hand()
         if dealer.hands[0].isBust and not self.isBust: #If the dealer goes bust, all non-busted hands win.
             if self.isBlackjack:
-                print("{player} wins with a blackjack, winning ${amount}!".format(player = self.player.name, amount = (self.bet * 1.5)))
+                self.player.game.display("blackjack_win", "{player} wins with a blackjack, winning ${amount}!", player = self.player.name, amount = (self.bet * self.player.game.blackjack_payout))
                 self.blackjack()
             else:
-                print("{player} wins ${bet}!".format(player = self.player.name, bet = self.bet))
+                self.player.game.display("win", "{player} wins ${bet}!", player = self.player.name, bet = self.bet)
                 self.win()
         elif not self.isBust: #If neither the dealer nor the player hand are bust, whoever is higher wins.
             if self.total > dealer.hands[0].total:
                 if self.isBlackjack:
-                    print("{player} wins with a blackjack, winning ${amount}!".format(player = self.player.name, amount = (self.bet * 1.5)))
+                    self.player.game.display("blackjack_win", "{player} wins with a blackjack, winning ${amount}!", player = self.player.name, amount = (self.bet * self.player.game.blackjack_payout))
                     self.blackjack()
                 else:
-                    print("{player} wins ${bet}!".format(player = self.player.name, bet = self.bet))
+                    self.player.game.display("win", "{player} wins ${bet}!", player = self.player.name, bet = self.bet)
                     self.win()
             elif self.total == dealer.hands[0].total: #If both hands have the same value, the hand is a push. Applies even if the player has blackjack.
-                print("{player}'s hand is a push.".format(player = self.player.name))
+                self.player.game.display("push", "{player}'s hand is a push.", player = self.player.name)
                 self.push()
             else: #If the dealer's hand has a higher value than the player's hand and neither are bust, the player loses.
-                print("{player} loses their ${bet} bet.".format(player = self.player.name, bet = self.bet))
+                self.player.game.display("lose", "{player} loses their ${bet} bet.", player = self.player.name, bet = self.bet)
+                self.outcome = "lose"
         else: #If the player is bust (or surrenders), they automatically lose.
-            print("{player} loses their ${bet} bet.".format(player = self.player.name, bet = self.bet))
+            self.player.game.display("lose", "{player} loses their ${bet} bet.", player = self.player.name, bet = self.bet)
+            if self.outcome is None: #Surrendered hands already have their outcome.
+                self.outcome = "bust"
 
     #These methods handle the logic and calculations for different payouts.
     def blackjack(self):
-        self.player.bankroll += self.bet * 2.5
+        self.player.bankroll += self.bet * (1 + self.player.game.blackjack_payout)
+        self.outcome = "blackjack"
     
     def win(self):
         self.player.bankroll += self.bet * 2
+        self.outcome = "win"
 
     def push(self):
         self.player.bankroll += self.bet
+        self.outcome = "push"
 
     def __str__(self):
         hand_string = " ".join(str(c) for c in self.cards)
@@ -549,17 +991,105 @@ class Hand:
     def __repr__(self):
         return "Player: {player}, Hand ID: {id}, cards: {cards}, total: {total}, soft Aces: {soft_aces}, current bet: {bet}\nCurrent hand states:\nLocked? {locked}\nFirst Turn? {firstTurn}\nBlackjack? {blackjack}\nBusted? {bust}".format(player = self.player, id = self.id, cards = self.cards, total = self.total, soft_aces = self.soft_aces, bet = self.bet, locked = self.locked, firstTurn = self.firstTurn, blackjack = self.isBlackjack, bust = self.isBust)
 
-game_state = GameState() #Initializes the table.
-game_state.display_welcome()
-game_state.create_players() #Creates a list of players and gets their names.
-while len(game_state.players_list) > 0: #If there are no players, the game ends.
-    game_state.check_shoe_size() #If there is a risk the current shoe will empty mid-round, adds decks to the shoe.
-    game_state.initial_deal() #Betting and initial round of cards.
-    if len(game_state.players_list) == 0: #Ends the game if all players choose to leave the table.
-        break
-    if game_state.dealer_start_round_checks(): #Dealer checks their hole card if they have an Ace or 10-value as their upcard. Skips the round if the dealer has a blackjack.
-        for p in game_state.players_list:
-            game_state.player_turn(p)
-        game_state.dealer.dealer_turn(game_state)
-        game_state.settle_round()
-    game_state.round_cleanup() #Clears hands and round-specific data
\ No newline at end of file
+#The Strategy class makes every decision for an automated player so the table can run without input(). The base strategy bets a flat amount, never buys insurance, only rebuys if told to, and always stands. Subclasses override whichever decisions they want to change.
+class Strategy:
+    def __init__(self, bet = 10, rebuy = False, side_bets = None):
+        self.bet = bet
+        self.rebuys = rebuy
+        self.side_bets = side_bets if side_bets is not None else {} #Flat side bet amounts by side bet name.
+
+    #Returns the bet for the player's initial hand. Returning 0 makes the player leave the table.
+    def get_bet(self, player, game):
+        return self.bet
+
+    def take_insurance(self, player, game):
+        return False
+
+    def rebuy(self, player, game):
+        return self.rebuys
+
+    #Returns the amount to bet on the named side bet, or 0 to skip it.
+    def get_side_bet(self, name, player, game):
+        return self.side_bets.get(name, 0)
+
+    #Returns one of the actions in valid_actions, which comes from Hand.create_action_list.
+    def choose_action(self, hand, valid_actions, game):
+        return "stand"
+
+#Plays the standard basic strategy for a dealer that stands on all 17s, with doubling and surrendering allowed after splits like the rest of the table rules.
+class BasicStrategy(Strategy):
+    #Each string holds the play against a dealer upcard of 2 through Ace. H: hit, S: stand, D: double (otherwise hit), B: double (otherwise stand), R: surrender (otherwise hit), P: split.
+    hard_table = {
+        9: "HDDDDHHHHH",
+        10: "DDDDDDDDHH",
+        11: "DDDDDDDDDH",
+        12: "HHSSSHHHHH",
+        13: "SSSSSHHHHH",
+        14: "SSSSSHHHHH",
+        15: "SSSSSHHHRH",
+        16: "SSSSSHHRRR",
+    }
+    soft_table = {
+        13: "HHHDDHHHHH",
+        14: "HHHDDHHHHH",
+        15: "HHDDDHHHHH",
+        16: "HHDDDHHHHH",
+        17: "HDDDDHHHHH",
+        18: "SBBBBSSHHH",
+    }
+    pair_table = {
+        "A": "PPPPPPPPPP",
+        "9": "PPPPPSPPSS",
+        "8": "PPPPPPPPPP",
+        "7": "PPPPPPHHHH",
+        "6": "PPPPPHHHHH",
+        "4": "HHHPPHHHHH",
+        "3": "PPPPPPHHHH",
+        "2": "PPPPPPHHHH",
+    }
+
+    def choose_action(self, hand, valid_actions, game):
+        column = game.dealer.hands[0].cards[0].value - 2 #Upcard values run from 2 to 11 (Ace).
+        play = self.get_play(hand, valid_actions, column)
+        if play == "P":
+            return "split"
+        if play in "DB" and "double" in valid_actions:
+            return "double"
+        if play == "R" and "surrender" in valid_actions:
+            return "surrender"
+        if play in "SB":
+            return "stand"
+        return "hit"
+
+    #Looks up the table entry for the hand, checking pairs first since a pair that can't be split is played by its total.
+    def get_play(self, hand, valid_actions, column):
+        if "split" in valid_actions and hand.cards[0].rank in self.pair_table:
+            play = self.pair_table[hand.cards[0].rank][column]
+            if play == "P":
+                return play
+        if hand.soft_aces > 0:
+            if hand.total >= 19:
+                return "S"
+            return self.soft_table.get(hand.total, "HHHHHHHHHH")[column]
+        if hand.total >= 17:
+            return "S"
+        return self.hard_table.get(hand.total, "HHHHHHHHHH")[column]
+
+#Plays basic strategy but sizes bets from the true count, betting one more unit for every true count above 1 up to the spread. Also takes insurance once the count shows enough 10-value cards are left. The table needs the count system in GameState.counting.
+class CountingStrategy(BasicStrategy):
+    def __init__(self, bet = 10, rebuy = False, system = "Hi-Lo", spread = 8, insurance_count = 3):
+        super().__init__(bet, rebuy)
+        self.system = system
+        self.spread = spread
+        self.insurance_count = insurance_count
+
+    def get_bet(self, player, game):
+        units = int(game.get_true_count(self.system))
+        return self.bet * max(1, min(self.spread, units))
+
+    def take_insurance(self, player, game):
+        return game.get_true_count(self.system) >= self.insurance_count
+
+if __name__ == "__main__": #Only starts an interactive game when run directly, so the classes can be imported for headless simulations. PlayBlackjack.py is the entry point for the game.
+    import PlayBlackjack
+    PlayBlackjack.main()
@@ -0,0 +1,113 @@
+import os
+import pickle
+import time
+import zlib
+
+from BlackjackSimulator import CompactShoe
+
+#Saves a table between rounds so a long simulation can pick up where it left off. A checkpoint holds the shoe and discard tray in order, the random number generator state, the round number, the players with their bankrolls and strategies, the card counts, and the running totals of a SimulationTable.
+#Cards are stored as one byte each, as their position among the distinct Cards of the table's deck list, so the resumed table deals the same Card objects in the same order. The distinct cards are saved too, and a checkpoint only loads into a table with the same deck. Restoring into a table with the same rules and then playing on gives exactly the same rounds as a run that never stopped.
+#Output sinks and hand history writers are not saved. Attach new ones after restoring.
+
+version = 2 #Version 1 checkpoints did not record the deck.
+
+#Maps each distinct Card in the deck list to its code, and each code back to its Card.
+def card_codes(game):
+    codes = {}
+    cards = []
+    for c in game.deck_list:
+        if id(c) not in codes:
+            codes[id(c)] = len(cards)
+            cards.append(c)
+    return codes, cards
+
+#Returns the cards in the shoe in list shoe order, which deals from the end.
+def shoe_list(game):
+    if hasattr(game.shoe, "cards"):
+        return list(reversed(game.shoe.cards()))
+    return game.shoe
+
+def save_checkpoint(game, path):
+    codes, cards = card_codes(game)
+    state = {
+        "version": version,
+        "decks": game.decks,
+        "cards": [str(c) for c in cards],
+        "round_number": game.round_number,
+        "rng": game.rng.getstate(),
+        "shoe": bytes(codes[id(c)] for c in shoe_list(game)),
+        "discards": bytes(codes[id(c)] for c in game.discards),
+        "players": [(p.name, p.bankroll, p.strategy) for p in game.players_list],
+        "counters": {name: c.remaining_tags for name, c in game.counters.items()},
+        "stats": getattr(game, "stats", None),
+    }
+    data = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f: #Written to a temporary file first and swapped in, so a crash mid-write leaves the last checkpoint intact.
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+#Restores a checkpoint into a freshly built table with the same rules. Any players already seated are replaced.
+def load_checkpoint(game, path):
+    with open(path, "rb") as f:
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state["version"] != version:
+        raise ValueError("{path} is a version {found} checkpoint, expected version {version}.".format(path = path, found = state["version"], version = version))
+    if state["decks"] != game.decks:
+        raise ValueError("{path} was saved from a {found}-deck table, but this table uses {decks} decks.".format(path = path, found = state["decks"], decks = game.decks))
+    codes, cards = card_codes(game)
+    if state["cards"] != [str(c) for c in cards]:
+        raise ValueError("{path} was saved from a table with a different deck, so its cards can't be dealt at this table.".format(path = path))
+    game.round_number = state["round_number"]
+    game.rng.setstate(state["rng"])
+    shoe = [cards[code] for code in state["shoe"]]
+    game.shoe = CompactShoe(game.deck_list, shoe) if game.compact_shoe else shoe
+    game.discards = [cards[code] for code in state["discards"]]
+    game.players_list = []
+    for name, bankroll, strategy in state["players"]:
+        game.add_player(name, strategy).bankroll = bankroll
+    for name, remaining_tags in state["counters"].items():
+        game.counters[name].remaining_tags = remaining_tags
+    if state["stats"] is not None:
+        game.stats = state["stats"]
+    return game
+
+#Saves checkpoints every so many rounds or seconds, whichever comes first.
+class Checkpointer:
+    def __init__(self, path, every_rounds = None, every_seconds = None):
+        self.path = path
+        self.every_rounds = every_rounds
+        self.every_seconds = every_seconds
+        self.last_round = None
+        self.last_time = time.time()
+
+    #Called after every round. Returns True if a checkpoint was written.
+    def maybe_save(self, game):
+        if self.last_round is None:
+            self.last_round = game.round_number
+        due = self.every_rounds and game.round_number - self.last_round >= self.every_rounds
+        if not due and self.every_seconds:
+            due = time.time() - self.last_time >= self.every_seconds
+        if due:
+            self.save(game)
+        return bool(due)
+
+    def save(self, game):
+        save_checkpoint(game, self.path)
+        self.last_round = game.round_number
+        self.last_time = time.time()
+
+#Plays until the table has played the given number of rounds in total, resuming from the checkpoint file if there is one and saving as it goes. Returns the number of rounds played in this run.
+def simulate_with_checkpoints(game, rounds, checkpointer):
+    if os.path.exists(checkpointer.path):
+        load_checkpoint(game, checkpointer.path)
+    played = 0
+    while game.round_number < rounds and len(game.players_list) > 0:
+        if not game.simulate(1):
+            break
+        played += 1
+        checkpointer.maybe_save(game)
+    checkpointer.save(game)
+    return played
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+from BlackjackSimulator import GameState
+
+#Calculates the exact distribution of the dealer's final hand for an upcard and the cards left in the shoe, playing out every possible draw with the dealer standing on stand_on, like GameState.dealer_stands_on.
+#Cards are grouped by their GameState.get_card_value, so a shoe is described by a tuple of ten counts: Aces, then 2 through 9, then 10-value cards. Upcards use the same values (1 for an Ace).
+#Answers are kept in a bounded cache that drops the least recently used entry when full, so asking again for the same shoe during a round is nearly free.
+class DealerProbabilities:
+    outcomes = (17, 18, 19, 20, 21, "bust", "blackjack") #The outcomes for the default dealer rule. Each calculator lists the totals its dealer can stand on.
+    stand_on = 17 #Matches the dealer rule in Player.dealer_turn and Hand.hit.
+
+    def __init__(self, cache_size = 10000, stand_on = 17):
+        if not 2 < stand_on <= 21:
+            raise ValueError("The dealer can't stand on {total}.".format(total = stand_on))
+        self.cache_size = cache_size
+        self.stand_on = stand_on
+        self.outcomes = tuple(range(stand_on, 22)) + ("bust", "blackjack")
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    #Returns a dictionary of outcome probabilities. With no_blackjack, the result is conditioned on the dealer not having blackjack, which is what players face once the dealer has checked their hole card.
+    def get_outcomes(self, upcard, counts, no_blackjack = False):
+        key = (upcard, tuple(counts), no_blackjack)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return dict(zip(self.outcomes, self.cache[key]))
+        self.misses += 1
+        result = self.calculate(upcard, key[1], no_blackjack)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+        return dict(zip(self.outcomes, result))
+
+    #Deals each possible hole card and plays out the rest of the hand.
+    def calculate(self, upcard, counts, no_blackjack):
+        left = sum(counts)
+        result = [0.0] * len(self.outcomes)
+        memo = {} #Hands that reach the same total with the same cards left play out the same way.
+        weight = 0
+        for v in range(1, 11):
+            c = counts[v - 1]
+            if c == 0:
+                continue
+            if {upcard, v} == {1, 10}:
+                if not no_blackjack:
+                    result[-1] += c / left
+                    weight += c
+                continue
+            weight += c
+            self.draw(result, upcard + v, upcard == 1 or v == 1, counts[:v - 1] + (c - 1,) + counts[v:], left - 1, c / left, memo)
+        if weight == 0:
+            return tuple(result)
+        return tuple(p * left / weight for p in result) #Only differs from the plain result when blackjacks are left out.
+
+    #Adds the outcomes of a hand with the given hard total (Aces counted as 1), weighted by the chance of reaching it. Hands that stand are added directly so that only hands that still hit need another call.
+    def draw(self, result, total, has_ace, counts, left, weight, memo):
+        best = total + 10 if has_ace and total + 10 <= 21 else total
+        if best >= self.stand_on:
+            result[-2 if best > 21 else best - self.stand_on] += weight
+            return
+        outcomes = self.play(total, has_ace, counts, left, memo)
+        for i in range(len(self.outcomes) - 1): #A hand that hits can never end in blackjack.
+            result[i] += outcomes[i] * weight
+
+    #Returns the outcome probabilities of a hand that still has to hit.
+    def play(self, total, has_ace, counts, left, memo):
+        key = (total, has_ace, counts)
+        result = memo.get(key)
+        if result is not None:
+            return result
+        result = [0.0] * len(self.outcomes) #Stays empty if the shoe runs out, which a real table never allows.
+        for v in range(1, 11):
+            c = counts[v - 1]
+            if c:
+                self.draw(result, total + v, has_ace or v == 1, counts[:v - 1] + (c - 1,) + counts[v:], left - 1, c / left, memo)
+        memo[key] = result
+        return result
+
+#Counts the cards by value using the table's rank model. Works for a list of Cards or a list shoe.
+def count_cards(game, cards):
+    counts = [0] * 10
+    for c in cards:
+        counts[game.get_card_value(c.rank) - 1] += 1
+    return tuple(counts)
+
+#Counts the cards left in the table's shoe, whether it is a list or a CompactShoe.
+def count_shoe(game):
+    cards = game.shoe.cards() if hasattr(game.shoe, "cards") else game.shoe
+    return count_cards(game, cards)
+
+if __name__ == "__main__":
+    game = GameState()
+    counts = list(count_cards(game, game.deck_list))
+    calculator = DealerProbabilities(stand_on = game.dealer_stands_on)
+    print("Upcard " + " ".join("{outcome:>9}".format(outcome = o) for o in calculator.outcomes))
+    for upcard in range(1, 11):
+        counts[upcard - 1] -= 1
+        result = calculator.get_outcomes(upcard, counts)
+        counts[upcard - 1] += 1
+        print("{upcard:>6} ".format(upcard = "A" if upcard == 1 else upcard) + " ".join("{p:>9.5f}".format(p = result[o]) for o in calculator.outcomes))
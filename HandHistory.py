@@ -0,0 +1,146 @@
+import mmap
+import struct
+from array import array
+
+#Streams every hand played at a table to a binary log of fixed-width records, one record per player hand. Attach a writer with game.history = HandHistoryWriter(path) and it is handed each round from GameState.round_cleanup.
+#Records are packed into a preallocated buffer and written out a chunk at a time, so logging costs one struct.pack_into per hand. The reader memory-maps the log and unpacks records only as they are iterated.
+
+magic = b"BJHH"
+version = 1
+max_cards = 12 #Cards kept per hand. Longer hands are cut short in the log, which needs well over 21 in small cards.
+max_actions = 12
+
+suits = ["♠", "♥", "♣", "♦"]
+ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+actions = ["hit", "stand", "double", "split", "surrender"]
+outcomes = ["lose", "win", "blackjack", "push", "bust", "surrender"]
+
+#Cards are stored as 1 + suit * 13 + rank, leaving 0 for an empty slot.
+card_codes = {r + s: 1 + si * 13 + ri for si, s in enumerate(suits) for ri, r in enumerate(ranks)}
+card_names = {code: name for name, code in card_codes.items()}
+action_codes = {a: i + 1 for i, a in enumerate(actions)}
+outcome_codes = {o: i for i, o in enumerate(outcomes)}
+
+#Round number, cards left in the shoe, seat, hand id, bet, net result, insurance, outcome, then the player cards, actions, and dealer cards.
+record = struct.Struct("<IIBBffBB{cards}s{actions}s{cards}s".format(cards = max_cards, actions = max_actions))
+header = struct.Struct("<4sHH")
+fields = ["round", "shoe_left", "seat", "hand", "bet", "net", "insurance", "outcome", "cards", "actions", "dealer_cards"]
+
+#Works out the change in bankroll for a settled hand, not counting insurance.
+def hand_net(hand):
+    if hand.outcome == "blackjack":
+        return hand.bet * hand.player.game.blackjack_payout
+    if hand.outcome == "win":
+        return hand.bet
+    if hand.outcome == "push":
+        return 0.0
+    return -hand.bet
+
+def encode_cards(cards):
+    return bytes(card_codes.get(str(c), 0) for c in cards[:max_cards])
+
+class HandHistoryWriter:
+    def __init__(self, path, chunk_records = 4096):
+        self.file = open(path, "wb")
+        self.file.write(header.pack(magic, version, record.size))
+        self.chunk_records = chunk_records
+        self.buffer = bytearray(record.size * chunk_records)
+        self.count = 0 #Records waiting in the buffer.
+        self.records = 0 #Records written in total.
+
+    #Packs one record for every hand at the table. Called before the hands are cleared.
+    def record_round(self, game):
+        dealer_cards = encode_cards(game.dealer.hands[0].cards) if game.dealer.hands else b""
+        for seat, p in enumerate(game.players_list):
+            for h in p.hands:
+                record.pack_into(self.buffer, self.count * record.size, game.round_number, len(game.shoe), seat, h.id, h.bet, hand_net(h), p.hasInsurance, outcome_codes.get(h.outcome, 0), encode_cards(h.cards), bytes(action_codes[a] for a in h.actions[:max_actions]), dealer_cards)
+                self.count += 1
+                if self.count == self.chunk_records:
+                    self.flush()
+
+    def flush(self):
+        if self.count > 0:
+            self.file.write(memoryview(self.buffer)[:self.count * record.size])
+            self.records += self.count
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+#Reads a hand history log through a memory map. Iterating gives one dictionary per hand, decoded only when it is reached.
+class HandHistoryReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        found, file_version, size = header.unpack_from(self.map, 0)
+        if found != magic or size != record.size:
+            raise ValueError("{path} is not a version {version} hand history log.".format(path = path, version = version))
+        self.offset = header.size
+        self.records = (len(self.map) - self.offset) // record.size
+
+    def __len__(self):
+        return self.records
+
+    #Yields the raw unpacked tuples without decoding the cards or actions.
+    def raw(self):
+        return record.iter_unpack(memoryview(self.map)[self.offset:self.offset + self.records * record.size])
+
+    def __iter__(self):
+        for r in self.raw():
+            hand = dict(zip(fields, r))
+            hand["insurance"] = bool(hand["insurance"])
+            hand["outcome"] = outcomes[hand["outcome"]]
+            for key in ["cards", "dealer_cards"]:
+                hand[key] = [card_names[c] for c in hand[key] if c]
+            hand["actions"] = [actions[a - 1] for a in hand["actions"] if a]
+            yield hand
+
+    #Groups the hands by round, yielding a list of hands for each round.
+    def rounds(self):
+        current = []
+        for hand in self:
+            if current and hand["round"] != current[0]["round"]:
+                yield current
+                current = []
+            current.append(hand)
+        if current:
+            yield current
+
+    #Builds one array per numeric field and one bytes column per card or action field, for columnar analysis.
+    def to_columns(self):
+        columns = {"round": array("I"), "shoe_left": array("I"), "seat": array("B"), "hand": array("B"), "bet": array("f"), "net": array("f"), "insurance": array("B"), "outcome": array("B")}
+        blobs = {"cards": [], "actions": [], "dealer_cards": []}
+        for r in self.raw():
+            for name, value in zip(fields, r):
+                if name in columns:
+                    columns[name].append(value)
+                else:
+                    blobs[name].append(value)
+        columns.update(blobs)
+        return columns
+
+    #Writes the log as a Parquet file. Needs pyarrow, which the rest of the simulator does not.
+    def export_parquet(self, path):
+        import pyarrow
+        import pyarrow.parquet
+        columns = self.to_columns()
+        table = pyarrow.table({name: list(values) for name, values in columns.items()})
+        pyarrow.parquet.write_table(table, path)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
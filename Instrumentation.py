@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+#Opt-in timing for the phases of a round. Attaching wraps the table's own methods on that one instance, so tables without instrumentation run the unmodified code and pay nothing.
+#Each phase keeps a call count, the total time, and a histogram of call times in power-of-two nanosecond buckets. Snapshots can be written to a JSON stats file or passed to a callback every so many rounds or seconds, so a running job can be watched.
+
+table_phases = ["check_shoe_size", "initial_deal", "dealer_start_round_checks", "player_turn", "settle_round", "round_cleanup", "reshuffle", "add_to_shoe"]
+
+class PhaseStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.histogram = [0] * 64 #Bucket n holds calls that took less than 2 ** n nanoseconds.
+
+    def add(self, elapsed):
+        self.calls += 1
+        self.total_ns += elapsed
+        self.histogram[elapsed.bit_length()] += 1
+
+    def snapshot(self):
+        last = max((i for i, n in enumerate(self.histogram) if n), default = 0)
+        return {"calls": self.calls, "total_ns": self.total_ns, "mean_ns": self.total_ns / self.calls if self.calls else 0.0, "histogram": self.histogram[:last + 1]}
+
+class Instrumentation:
+    def __init__(self, path = None, callback = None, every_rounds = None, every_seconds = None):
+        self.path = path #Stats file rewritten with each snapshot.
+        self.callback = callback #Called with each snapshot.
+        self.every_rounds = every_rounds
+        self.every_seconds = every_seconds
+        self.phases = {}
+        self.rounds = 0
+        self.started = time.time()
+        self.last_rounds = 0
+        self.last_time = self.started
+        self.attached = []
+
+    #Replaces a method on one object with a timed version that records into the named phase. Objects with __slots__, like players, can't hold methods of their own, so they are moved to a one-off subclass that has the timed method instead.
+    def wrap(self, owner, method_name, phase):
+        stats = self.phases.setdefault(phase, PhaseStats())
+        method = getattr(owner, method_name)
+        clock = time.perf_counter_ns
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.add(clock() - start)
+        original_class = None
+        if hasattr(owner, "__dict__"):
+            setattr(owner, method_name, timed)
+        else:
+            original_class = type(owner)
+            owner.__class__ = type(original_class.__name__, (original_class,), {"__slots__": (), method_name: lambda owner, *args, **kwargs: timed(*args, **kwargs)})
+        self.attached.append((owner, method_name, original_class))
+        return timed
+
+    #Times every phase of the table's rounds, the dealer's turn, and the decisions of the strategies seated at the table.
+    def attach(self, game):
+        for name in table_phases:
+            self.wrap(game, name, name)
+        self.wrap(game.dealer, "dealer_turn", "dealer_turn")
+        self.wrap(game, "strategy_action", "strategy") #Timed at the table rather than on the strategy, which other tables may share.
+        cleanup = game.round_cleanup
+        def round_cleanup():
+            cleanup()
+            self.end_round()
+        game.round_cleanup = round_cleanup
+        return self
+
+    #Puts back the original methods.
+    def detach(self):
+        for owner, method_name, original_class in reversed(self.attached):
+            if original_class is not None:
+                owner.__class__ = original_class
+            elif method_name in vars(owner):
+                delattr(owner, method_name)
+        self.attached = []
+
+    def end_round(self):
+        self.rounds += 1
+        if self.every_rounds and self.rounds - self.last_rounds >= self.every_rounds:
+            self.emit()
+        elif self.every_seconds and time.time() - self.last_time >= self.every_seconds:
+            self.emit()
+
+    def snapshot(self):
+        return {"time": time.time(), "elapsed": time.time() - self.started, "rounds": self.rounds, "phases": {name: stats.snapshot() for name, stats in self.phases.items()}}
+
+    #Writes a snapshot to the stats file and passes it to the callback. The file is replaced in one step so readers never see half a snapshot.
+    def emit(self):
+        snapshot = self.snapshot()
+        self.last_rounds = self.rounds
+        self.last_time = time.time()
+        if self.path:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.path)
+        if self.callback:
+            self.callback(snapshot)
+        return snapshot
+
+    #Lists the phases by total time, for a quick look at where a run is spending its time.
+    def report(self):
+        lines = []
+        for name, stats in sorted(self.phases.items(), key = lambda item: -item[1].total_ns):
+            lines.append("{phase:<26} {calls:>10} calls {total:>10.3f} s {mean:>10.0f} ns/call".format(phase = name, calls = stats.calls, total = stats.total_ns / 1e9, mean = stats.total_ns / stats.calls if stats.calls else 0))
+        return "\n".join(lines)
@@ -0,0 +1,108 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+
+from BlackjackSimulator import GameState, BasicStrategy, CountingStrategy
+from SimulationRunner import SimulationTable, summarize
+
+#Plays every combination of a grid of table rules and collects the results in one CSV table, one row per set of rules.
+#Each set of rules is played by a worker process at its own table, and tables with the same number of decks share one deck list through GameState's deck cache. Each table is seeded from the master seed and the rules themselves, so a row comes out the same no matter which worker plays it or in what order. Rows are written as they finish, and rules that already have a row in the output file are skipped, so a sweep that was stopped can be run again to fill in the rest.
+#Insurance only matters to strategies that take it. The basic strategy never does, so sweeping insurance_cost needs a strategy like CountingStrategy, which takes insurance on a high count. Rules that stay the same for every row, like the count systems a counting strategy reads, are passed separately from the grid.
+
+rule_names = ["decks", "surrender_allowed", "max_hands", "dealer_stands_on", "blackjack_payout", "insurance_cost"]
+result_names = ["rounds", "hands", "wagered", "net", "rebuys", "ev_per_round", "std_error", "ev_per_wager"]
+
+#Turns a grid of rule values into a list of rule sets, one for every combination. Rules left out of the grid keep the GameState default. Rule sets with the same deck count are kept together.
+def expand_grid(grid):
+    for rule in grid:
+        if rule not in rule_names:
+            raise ValueError("{rule} is not a rule that can be swept.".format(rule = rule))
+    values = [grid.get(rule, [getattr(GameState, rule)]) for rule in rule_names]
+    return [dict(zip(rule_names, combo)) for combo in itertools.product(*values)]
+
+#The rule values as they appear in the results table, used to match rule sets against rows already written.
+def config_key(config):
+    return tuple(str(config[rule]) for rule in rule_names)
+
+def config_seed(seed, config):
+    return random.Random("{seed}:{key}".format(seed = seed, key = ",".join(config_key(config)))).getrandbits(64)
+
+#Returns the keys of the rule sets that already have a row in the results file.
+def read_done(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline = "") as f:
+        return {tuple(row[rule] for rule in rule_names) for row in csv.DictReader(f)}
+
+#Plays one rule set. Takes a single tuple so it can be used with Pool.imap_unordered.
+def run_config(job):
+    seed, rounds, num_players, strategy, rules, config = job
+    table = SimulationTable(seed, **dict(rules, **config))
+    seated = [table.add_player("Player {num}".format(num = p + 1), strategy) for p in range(num_players)]
+    while table.stats["rounds"] < rounds and len(table.players_list) > 0:
+        if not table.play_tracked_round(seated):
+            break
+    return config, summarize(table.stats)
+
+#Plays every rule set in the grid that is not already in the results file and appends a row for each. Returns the number of rule sets played.
+#Any other table rules, such as counting = ["Hi-Lo"] for a CountingStrategy, are passed by name and used at every table. They can't also be in the grid.
+def run_sweep(grid, rounds, path, workers = None, seed = 0, num_players = 1, strategy = None, **rules):
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if strategy is None:
+        strategy = BasicStrategy(rebuy = True)
+    for rule in rules:
+        if rule in rule_names:
+            raise ValueError("{rule} is swept, so it can't also be a fixed rule.".format(rule = rule))
+    done = read_done(path)
+    jobs = [(config_seed(seed, c), rounds, num_players, strategy, rules, c) for c in expand_grid(grid) if config_key(c) not in done]
+    if not jobs:
+        return 0
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline = "") as f:
+        writer = csv.DictWriter(f, fieldnames = rule_names + result_names, extrasaction = "ignore")
+        if new_file:
+            writer.writeheader()
+        if workers == 1:
+            for config, summary in map(run_config, jobs):
+                writer.writerow(dict(config, **summary))
+                f.flush()
+        else:
+            with multiprocessing.Pool(min(workers, len(jobs))) as pool:
+                for config, summary in pool.imap_unordered(run_config, jobs):
+                    writer.writerow(dict(config, **summary))
+                    f.flush()
+    return len(jobs)
+
+def parse_bool(text):
+    if text.lower() in ("true", "yes", "1"):
+        return True
+    if text.lower() in ("false", "no", "0"):
+        return False
+    raise argparse.ArgumentTypeError("{text} is not true or false.".format(text = text))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Plays a grid of table rules and writes the results to one CSV table.")
+    parser.add_argument("rounds", type = int, help = "Rounds to play for each set of rules.")
+    parser.add_argument("--output", default = "sweep.csv", help = "Results table. Rule sets already in it are skipped.")
+    parser.add_argument("--decks", type = int, nargs = "+")
+    parser.add_argument("--surrender", type = parse_bool, nargs = "+", dest = "surrender_allowed")
+    parser.add_argument("--max-hands", type = int, nargs = "+", dest = "max_hands")
+    parser.add_argument("--stands-on", type = int, nargs = "+", dest = "dealer_stands_on")
+    parser.add_argument("--payout", type = float, nargs = "+", dest = "blackjack_payout")
+    parser.add_argument("--insurance", type = float, nargs = "+", dest = "insurance_cost")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--bet", type = int, default = 10)
+    parser.add_argument("--strategy", choices = ["basic", "counting"], default = "basic", help = "The counting strategy spreads its bets and takes insurance by the Hi-Lo count, so it is the one to use when sweeping insurance.")
+    args = parser.parse_args()
+    grid = {rule: getattr(args, rule) for rule in rule_names if getattr(args, rule) is not None}
+    if args.strategy == "counting":
+        played = run_sweep(grid, args.rounds, args.output, args.workers, args.seed, args.players, CountingStrategy(args.bet, rebuy = True), counting = ["Hi-Lo"])
+    else:
+        played = run_sweep(grid, args.rounds, args.output, args.workers, args.seed, args.players, BasicStrategy(args.bet, rebuy = True))
+    print("Played {played} rule sets. Results are in {path}.".format(played = played, path = args.output))
@@ -0,0 +1,13 @@
+from BlackjackSimulator import GameState
+
+#Starts the interactive game at the terminal. BlackjackSimulator.py only holds the classes, so importing it never prints or asks for input.
+def main():
+    game_state = GameState() #Initializes the table.
+    game_state.display_welcome()
+    game_state.create_players() #Creates a list of players and gets their names.
+    while len(game_state.players_list) > 0: #If there are no players, the game ends.
+        if not game_state.play_round():
+            break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import math
+import random
+from statistics import NormalDist
+
+from BlackjackSimulator import BasicStrategy, CardCounter, count_systems
+from SimulationRunner import SimulationTable
+
+#Estimates the chance of rare events, like a player going broke from the buy-in or a player splitting up to max_hands, with less noise per round played than plain simulation.
+#Each estimate is built from independent sessions, and every session is played at a fresh table through the usual round flow, so hands are settled by Hand.settle and Player.dealer_blackjack as always. Three ways of cutting the noise can be used:
+#Antithetic shuffles play every session twice, the second time dealing each shuffled shoe in reverse order, and average the pair.
+#A tilted shoe deals cards with a bias, such as more low cards to make ruin more likely, and weights each session by the likelihood ratio of the cards it dealt, so the estimate stays unbiased.
+#Common random numbers give every strategy being compared the same seed for each session, so they see the same shuffles and the difference between them has less noise than either result.
+#Estimates stop early once their confidence interval is as narrow as asked for.
+
+#Running mean and variance of the session results, with a normal confidence interval.
+class Estimate:
+    def __init__(self, confidence = 0.95):
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.count = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+
+    def add(self, x):
+        self.count += 1
+        self.total += x
+        self.total_squared += x * x
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def std_error(self):
+        if self.count < 2:
+            return math.inf
+        mean = self.mean()
+        variance = max(self.total_squared - self.count * mean * mean, 0.0) / (self.count - 1)
+        return math.sqrt(variance / self.count)
+
+    def half_width(self):
+        return self.z * self.std_error()
+
+    def interval(self):
+        return self.mean() - self.half_width(), self.mean() + self.half_width()
+
+    #True once the interval is no wider than target on either side, or than relative times the mean. Never true before the results have varied at all, since a rare event that has not happened yet looks perfectly precise.
+    def precise(self, target = None, relative = None):
+        if not 0 < self.std_error() < math.inf:
+            return False
+        if target is not None and self.half_width() <= target:
+            return True
+        if relative is not None and self.mean() != 0 and self.half_width() <= relative * abs(self.mean()):
+            return True
+        return False
+
+    def summary(self):
+        low, high = self.interval()
+        return {"sessions": self.count, "mean": self.mean(), "std_error": self.std_error(), "confidence": self.confidence, "low": low, "high": high}
+
+#Shuffles like random.Random but reverses every shuffled list, so a table seeded the same way deals each shoe back to front. Reversing a uniform shuffle is still a uniform shuffle.
+class ReversedShuffleRandom(random.Random):
+    def shuffle(self, x):
+        super().shuffle(x)
+        x.reverse()
+
+#Returns tilt weights for every rank that deal cards in proportion to exp(strength * tag) for a count system's tags. A positive strength deals more low cards for Hi-Lo, which favors the dealer.
+def count_tilt(strength, system = "Hi-Lo"):
+    tags = CardCounter(system, count_systems[system]).tags
+    return {rank: math.exp(strength * tag) for rank, tag in tags.items()}
+
+#A shoe that deals a random card with each rank weighted by the tilt, instead of dealing from a shuffled order. Each card dealt multiplies the table's likelihood by the chance of that card in a plain shoe over its chance in this one.
+#Dealing a random card from what is left is the same as dealing from a uniformly shuffled shoe, so the likelihood ratio is exact.
+class TiltedShoe:
+    def __init__(self, weights, table):
+        self.weights = weights
+        self.table = table
+        self.ranks = {rank: [] for rank in weights}
+        self.size = 0
+
+    def extend(self, cards):
+        for c in cards:
+            self.ranks[c.rank].append(c)
+        self.size += len(cards)
+
+    def pop(self):
+        rng = self.table.rng
+        total = sum(self.weights[rank] * len(cards) for rank, cards in self.ranks.items())
+        x = rng.random() * total
+        for rank, cards in self.ranks.items():
+            if cards:
+                chosen = rank
+                x -= self.weights[rank] * len(cards)
+                if x < 0:
+                    break
+        rank = chosen
+        cards = self.ranks[rank]
+        i = rng.randrange(len(cards))
+        card = cards[i]
+        cards[i] = cards[-1]
+        cards.pop()
+        self.table.likelihood *= total / (self.size * self.weights[rank])
+        self.size -= 1
+        return card
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return "Tilted shoe with {size} cards".format(size = self.size)
+
+#A headless table that can deal from a tilted shoe or reverse its shuffles, and keeps the likelihood of the cards dealt so far. It also counts the rounds in which a player reached max_hands, weighted by the likelihood at the time.
+class RareEventTable(SimulationTable):
+    def __init__(self, seed = None, tilt = None, antithetic = False, **rules):
+        if tilt is not None and antithetic:
+            raise ValueError("A tilted shoe does not use the shuffle, so it can't be paired with an antithetic shuffle.")
+        super().__init__(seed, **rules)
+        if antithetic:
+            self.rng = ReversedShuffleRandom(seed)
+        self.tilt = tilt
+        self.likelihood = 1.0
+        self.max_hand_rounds = 0.0
+
+    def add_to_shoe(self):
+        if self.tilt is None:
+            return super().add_to_shoe()
+        for c in self.counters.values():
+            c.add_decks()
+        if not isinstance(self.shoe, TiltedShoe):
+            shoe = TiltedShoe(self.tilt, self)
+            shoe.extend(self.shoe)
+            self.shoe = shoe
+        self.shoe.extend(self.deck_list)
+        return self.deck_value
+
+    def reshuffle(self):
+        if self.tilt is None:
+            return super().reshuffle()
+        for c in self.counters.values():
+            c.add_cards(self.discards)
+        self.shoe.extend(self.discards)
+        self.discards.clear()
+
+    def round_cleanup(self):
+        if any(len(p.hands) >= self.max_hands for p in self.players_list):
+            self.max_hand_rounds += self.likelihood
+        super().round_cleanup()
+
+#Session results. Each plays up to the given number of rounds and returns the event weighted by the table's likelihood.
+#Ruin is every player leaving the table broke. Players should not rebuy.
+def ruin_session(table, rounds):
+    table.simulate(rounds)
+    return table.likelihood if len(table.players_list) == 0 else 0.0
+
+#The share of rounds in which a player reached max_hands.
+def max_hands_session(table, rounds):
+    played = table.simulate(rounds)
+    return table.max_hand_rounds / played if played else 0.0
+
+events = {"ruin": ruin_session, "max_hands": max_hands_session}
+
+#Plays one session for each strategy, all from the same seed. With antithetic shuffles each result is the average of the session and its reversed twin.
+def play_session(event, seed, rounds, strategies, num_players, tilt, antithetic, rules):
+    results = []
+    for strategy in strategies:
+        tables = [RareEventTable(seed, tilt, **rules)]
+        if antithetic:
+            tables.append(RareEventTable(seed, antithetic = True, **rules))
+        total = 0.0
+        for table in tables:
+            for p in range(num_players):
+                table.add_player("Player {num}".format(num = p + 1), strategy)
+            total += event(table, rounds)
+        results.append(total / len(tables))
+    return results
+
+#Estimates the chance of an event for each strategy, and the difference between every strategy and the first, using common random numbers. Plays sessions until the differences (or the single estimate) reach the target precision, or max_sessions have been played. Returns a summary for each strategy and each difference.
+def estimate(event, strategies = None, rounds = 1000, max_sessions = 100000, min_sessions = 100, seed = 0, num_players = 1, tilt = None, antithetic = False, target = None, relative = None, confidence = 0.95, **rules):
+    if isinstance(event, str):
+        event = events[event]
+    if strategies is None:
+        strategies = [BasicStrategy()]
+    master = random.Random(seed)
+    results = [Estimate(confidence) for s in strategies]
+    differences = [Estimate(confidence) for s in strategies[1:]]
+    watched = differences if differences else results
+    for n in range(max_sessions):
+        session = play_session(event, master.getrandbits(64), rounds, strategies, num_players, tilt, antithetic, rules)
+        for est, x in zip(results, session):
+            est.add(x)
+        for est, x in zip(differences, session[1:]):
+            est.add(x - session[0])
+        if n + 1 >= min_sessions and (target is not None or relative is not None) and all(est.precise(target, relative) for est in watched):
+            break
+    return {"results": [est.summary() for est in results], "differences": [est.summary() for est in differences]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Estimates the chance of rare events with variance reduction.")
+    parser.add_argument("event", choices = sorted(events))
+    parser.add_argument("--rounds", type = int, default = 1000, help = "Rounds per session.")
+    parser.add_argument("--sessions", type = int, default = 10000, help = "Most sessions to play.")
+    parser.add_argument("--min-sessions", type = int, default = 100)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--decks", type = int, default = 1)
+    parser.add_argument("--bet", type = int, default = 10)
+    parser.add_argument("--tilt", type = float, default = None, help = "Strength of the Hi-Lo tilt. Positive deals more low cards.")
+    parser.add_argument("--antithetic", action = "store_true")
+    parser.add_argument("--target", type = float, default = None, help = "Stop once the interval is this narrow on either side.")
+    parser.add_argument("--relative", type = float, default = None, help = "Stop once the interval is this share of the estimate on either side.")
+    parser.add_argument("--confidence", type = float, default = 0.95)
+    args = parser.parse_args()
+    tilt = count_tilt(args.tilt) if args.tilt is not None else None
+    report = estimate(args.event, [BasicStrategy(args.bet)], args.rounds, args.sessions, args.min_sessions, args.seed, args.players, tilt, args.antithetic, args.target, args.relative, args.confidence, decks = args.decks)
+    for key, value in report["results"][0].items():
+        print("{key}: {value}".format(key = key, value = value))
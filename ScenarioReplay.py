@@ -0,0 +1,225 @@
+import argparse
+import json
+import sys
+import time
+
+from BlackjackSimulator import GameState, Card, Strategy, CountingStrategy, NullSink, TextSink
+from Checkpoint import shoe_list
+
+#Replays scripted rounds from a stacked shoe, to check rule edge cases like split Aces, insurance against a dealer blackjack, or surrender without waiting for a shuffle to deal them.
+#A scenario lists the table rules, the cards in the order they are dealt, and for each player their starting bankroll, their bets, their insurance answers, and their actions in the order they are asked for. It is played through the usual round flow and passes if every player ends with the expected bankroll and every scripted answer was used.
+#A corpus is a file with one scenario per line as JSON. Corpora can be written by hand or recorded from seeded play, and the recorded results checked again after every change to the rules.
+#The check command records a corpus and replays it in one go. Recording and replay play the same rules, so every recorded scenario has to pass.
+#Cards are written as rank then suit, such as "10♥" or "AS", with S, H, C, and D standing in for the suit symbols. A rank on its own is a spade.
+
+suit_letters = {"S": "♠", "H": "♥", "C": "♣", "D": "♦"}
+
+def parse_card(text):
+    if text[-1] in suit_letters:
+        return Card(text[:-1], suit_letters[text[-1]])
+    if text[-1] in suit_letters.values():
+        return Card(text[:-1], text[-1])
+    return Card(text, "♠")
+
+#Makes each decision from a script, and stops the scenario if the script runs out or asks for an action that isn't allowed.
+class ScriptedStrategy(Strategy):
+    def __init__(self, bets, insurance = (), actions = (), rebuy = False):
+        super().__init__(rebuy = rebuy)
+        self.bets = list(bets)
+        self.insurance = list(insurance)
+        self.actions = list(actions)
+
+    def get_bet(self, player, game):
+        if not self.bets:
+            raise ValueError("{player} has no bet left in the script.".format(player = player.name))
+        return self.bets.pop(0)
+
+    def take_insurance(self, player, game):
+        if not self.insurance:
+            raise ValueError("{player} was offered insurance but has no answer left in the script.".format(player = player.name))
+        return self.insurance.pop(0)
+
+    def choose_action(self, hand, valid_actions, game):
+        if not self.actions:
+            raise ValueError("{player} has no action left in the script for {hand}.".format(player = hand.player.name, hand = hand))
+        action = self.actions.pop(0)
+        if action not in valid_actions:
+            raise ValueError("{player} can't {action} on {hand}. Allowed: {valid}.".format(player = hand.player.name, action = action, hand = hand, valid = ", ".join(valid_actions)))
+        return action
+
+    def unused(self):
+        return len(self.bets) + len(self.insurance) + len(self.actions)
+
+#A table that deals only from the stacked shoe. It never shuffles, and running out of cards ends the scenario.
+class ScenarioTable(GameState):
+    def __init__(self, shoe, **rules):
+        super().__init__(0, **rules)
+        self.output = NullSink()
+        self.shoe = [parse_card(c) for c in reversed(shoe)] #The shoe deals from the end.
+
+    def check_shoe_size(self):
+        pass
+
+    def reshuffle(self):
+        raise ValueError("The scenario's shoe ran out of cards.")
+
+    def add_to_shoe(self):
+        raise ValueError("The scenario's shoe ran out of cards.")
+
+#Plays one scenario. Returns the scenario's name, whether it passed, the bankrolls it ended with, and the reason it failed if it did.
+def run_scenario(scenario, output = None):
+    result = {"name": scenario.get("name"), "passed": False, "bankrolls": {}, "error": None}
+    try:
+        table = ScenarioTable(scenario["shoe"], **scenario.get("rules", {}))
+        if output is not None:
+            table.output = output
+        seated = []
+        for p in scenario["players"]:
+            bets = p["bets"] if isinstance(p["bets"], list) else [p["bets"]] * scenario.get("rounds", 1)
+            player = table.add_player(p["name"], ScriptedStrategy(bets, p.get("insurance", []), p.get("actions", []), p.get("rebuy", False)))
+            player.bankroll = p.get("bankroll", table.buy_in)
+            seated.append(player)
+        for r in range(scenario.get("rounds", 1)):
+            if not table.play_round():
+                break
+    except ValueError as error:
+        result["error"] = str(error)
+        return result
+    result["bankrolls"] = {p.name: p.bankroll for p in seated}
+    unused = [p.name for p in seated if p.strategy.unused()]
+    if unused:
+        result["error"] = "Unused script left for {players}.".format(players = ", ".join(unused))
+    elif result["bankrolls"] != scenario["expected"]:
+        result["error"] = "Expected {expected}, got {actual}.".format(expected = scenario["expected"], actual = result["bankrolls"])
+    else:
+        result["passed"] = True
+    return result
+
+def load_corpus(path):
+    with open(path, encoding = "utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_corpus(path, scenarios):
+    with open(path, "w", encoding = "utf-8") as f:
+        for s in scenarios:
+            f.write(json.dumps(s, ensure_ascii = False) + "\n")
+
+def run_corpus(scenarios):
+    return [run_scenario(s) for s in scenarios]
+
+#Wraps a strategy and writes down every decision it makes, so a round played with it can be turned into a script.
+class RecordingStrategy(Strategy):
+    def __init__(self, strategy):
+        super().__init__(rebuy = False)
+        self.strategy = strategy
+        self.clear()
+
+    def clear(self):
+        self.bets = []
+        self.insurance = []
+        self.actions = []
+
+    def get_bet(self, player, game):
+        bet = self.strategy.get_bet(player, game)
+        self.bets.append(bet)
+        return bet
+
+    def take_insurance(self, player, game):
+        choice = self.strategy.take_insurance(player, game)
+        self.insurance.append(choice)
+        return choice
+
+    def choose_action(self, hand, valid_actions, game):
+        action = self.strategy.choose_action(hand, valid_actions, game)
+        self.actions.append(action)
+        return action
+
+#Hand history recorder that counts the cards on the table at the end of each round.
+class CardsDealt:
+    def record_round(self, game):
+        self.count = sum(len(h.cards) for p in game.players_list + [game.dealer] for h in p.hands)
+
+#Plays seeded rounds with counting players and records each one as a scenario, with the results the current rules give as the expected bankrolls. Rounds where the shoe ran out mid-round are left out.
+def record_corpus(count, seed = 0, num_players = 3, **rules):
+    rules.setdefault("counting", ["Hi-Lo"])
+    game = GameState(seed, **rules)
+    game.output = NullSink()
+    game.history = CardsDealt()
+    recorders = [RecordingStrategy(CountingStrategy()) for p in range(num_players)]
+    seated = [game.add_player("Player {num}".format(num = p + 1), r) for p, r in enumerate(recorders)]
+    scenario_rules = {k: v for k, v in rules.items() if k != "counting"}
+    scenarios = []
+    while len(scenarios) < count:
+        for p in seated:
+            if p not in game.players_list: #Broke players come back with a new buy-in so every scenario has the same seats.
+                p.bankroll = game.buy_in
+                game.players_list.append(p)
+        game.check_shoe_size()
+        shoe = [str(c) for c in reversed(shoe_list(game))] #Works with a list shoe or a CompactShoe.
+        order = list(game.players_list) #A player who came back from going broke sits at the end, and the scenario has to deal to them in the same order.
+        before = [p.bankroll for p in order]
+        for r in recorders:
+            r.clear()
+        game.play_round()
+        if game.history.count > len(shoe):
+            continue
+        scenarios.append({
+            "name": "recorded {seed}-{num}".format(seed = seed, num = len(scenarios) + 1),
+            "rules": scenario_rules,
+            "shoe": shoe[:game.history.count],
+            "players": [{"name": p.name, "bankroll": b, "bets": p.strategy.bets, "insurance": p.strategy.insurance, "actions": p.strategy.actions} for p, b in zip(order, before)],
+            "expected": {p.name: p.bankroll for p in order},
+        })
+    return scenarios
+
+#Records a corpus from seeded play and replays it straight away. Every recorded scenario should pass, so any failure means recording and replay disagree about the rules. Returns the failed results.
+def check_recording(count, seed = 0, num_players = 3, **rules):
+    return [r for r in run_corpus(record_corpus(count, seed, num_players, **rules)) if not r["passed"]]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replays scripted blackjack scenarios from a stacked shoe and checks the bankrolls they end with.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    run_parser = commands.add_parser("run", help = "Replays every scenario in a corpus.")
+    run_parser.add_argument("corpus")
+    run_parser.add_argument("--show", help = "Prints the table messages for the scenario with this name.")
+    run_parser.add_argument("--update", action = "store_true", help = "Rewrites the expected bankrolls with the ones the scenarios end with.")
+    record_parser = commands.add_parser("record", help = "Records seeded rounds as a new corpus.")
+    record_parser.add_argument("corpus")
+    record_parser.add_argument("--count", type = int, default = 1000)
+    record_parser.add_argument("--seed", type = int, default = 0)
+    record_parser.add_argument("--players", type = int, default = 3)
+    record_parser.add_argument("--decks", type = int, default = 1)
+    check_parser = commands.add_parser("check", help = "Records seeded rounds and checks that every one of them replays.")
+    check_parser.add_argument("--count", type = int, default = 5000)
+    check_parser.add_argument("--seed", type = int, default = 0)
+    check_parser.add_argument("--players", type = int, default = 3)
+    check_parser.add_argument("--decks", type = int, default = 1)
+    args = parser.parse_args()
+    if args.command == "record":
+        save_corpus(args.corpus, record_corpus(args.count, args.seed, args.players, decks = args.decks))
+        sys.exit(0)
+    if args.command == "check":
+        failed = check_recording(args.count, args.seed, args.players, decks = args.decks)
+        for r in failed:
+            print("FAILED {name}: {error}".format(name = r["name"], error = r["error"]))
+        print("{passed} of {total} recorded scenarios replayed.".format(passed = args.count - len(failed), total = args.count))
+        sys.exit(1 if failed else 0)
+    scenarios = load_corpus(args.corpus)
+    if args.show:
+        for s in scenarios:
+            if s.get("name") == args.show:
+                print(run_scenario(s, TextSink()))
+        sys.exit(0)
+    start = time.perf_counter()
+    results = run_corpus(scenarios)
+    elapsed = time.perf_counter() - start
+    if args.update:
+        for s, r in zip(scenarios, results):
+            if r["bankrolls"]:
+                s["expected"] = r["bankrolls"]
+        save_corpus(args.corpus, scenarios)
+    failed = [r for r in results if not r["passed"]]
+    for r in failed:
+        print("FAILED {name}: {error}".format(name = r["name"], error = r["error"]))
+    print("{passed} of {total} scenarios passed in {seconds:.2f} s.".format(passed = len(results) - len(failed), total = len(results), seconds = elapsed))
+    sys.exit(1 if failed and not args.update else 0)
@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import random
+
+from BlackjackSimulator import GameState, BasicStrategy, NullSink
+
+#A headless table that keeps running totals of every round it plays. The totals are plain numbers so they can be sent back from worker processes and merged.
+class SimulationTable(GameState):
+    def __init__(self, seed = None, decks = None, **rules):
+        if decks is not None:
+            rules["decks"] = decks
+        super().__init__(seed, **rules)
+        self.output = NullSink()
+        self.stats = new_stats()
+
+    #Counts the hands, bets, and rebuys for the round before the hands are cleared.
+    def round_cleanup(self):
+        broke = []
+        for p in self.players_list:
+            for h in p.hands:
+                self.stats["hands"] += 1
+                self.stats["wagered"] += h.bet
+            if p.bankroll < 1:
+                broke.append(p)
+        super().round_cleanup()
+        for p in broke:
+            if p in self.players_list:
+                self.stats["rebuys"] += 1
+
+    #Plays one round and records the change in the players' combined bankroll, leaving out any rebuys.
+    def play_tracked_round(self, seated):
+        rebuys = self.stats["rebuys"]
+        before = sum(p.bankroll for p in seated)
+        if not self.play_round():
+            return False
+        net = sum(p.bankroll for p in seated) - before - (self.stats["rebuys"] - rebuys) * self.buy_in
+        self.stats["rounds"] += 1
+        self.stats["net"] += net
+        self.stats["net_squared"] += net * net
+        return True
+
+def new_stats():
+    return {"rounds": 0, "hands": 0, "wagered": 0.0, "net": 0.0, "net_squared": 0.0, "rebuys": 0}
+
+#Adds the totals from another set of stats. Merging in the same order always gives the same result.
+def merge_stats(total, stats):
+    for key in total:
+        total[key] += stats[key]
+    return total
+
+#Derives an independent seed for each worker from the master seed, so the same seed and worker count always give the same shards.
+def derive_seeds(seed, workers):
+    master = random.Random(seed)
+    return [master.getrandbits(64) for w in range(workers)]
+
+#Splits the rounds as evenly as possible between the workers.
+def split_rounds(rounds, workers):
+    share, extra = divmod(rounds, workers)
+    return [share + (1 if w < extra else 0) for w in range(workers)]
+
+#Runs one shard of the simulation at its own table. Takes a single tuple so it can be used with Pool.map.
+def run_shard(shard):
+    seed, rounds, num_players, strategy, decks = shard
+    table = SimulationTable(seed, decks)
+    seated = [table.add_player("Player {num}".format(num = p + 1), strategy) for p in range(num_players)]
+    while table.stats["rounds"] < rounds and len(table.players_list) > 0:
+        if not table.play_tracked_round(seated):
+            break
+    return table.stats
+
+#Shards the rounds across a process pool and merges the results. Each worker plays its shard at a separate table with its own seeded random number generator.
+def run_simulation(rounds, workers = None, seed = 0, num_players = 1, strategy = None, decks = None):
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if strategy is None:
+        strategy = BasicStrategy(rebuy = True)
+    shards = [(s, r, num_players, strategy, decks) for s, r in zip(derive_seeds(seed, workers), split_rounds(rounds, workers))]
+    if workers == 1:
+        results = [run_shard(shards[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(run_shard, shards, chunksize = 1)
+    total = new_stats()
+    for stats in results:
+        merge_stats(total, stats)
+    return total
+
+#Adds the expected value per round and per unit wagered, with the standard error of the per-round result.
+def summarize(stats):
+    summary = dict(stats)
+    rounds = stats["rounds"]
+    if rounds > 0:
+        mean = stats["net"] / rounds
+        variance = max(stats["net_squared"] / rounds - mean * mean, 0.0)
+        summary["ev_per_round"] = mean
+        summary["std_error"] = (variance / rounds) ** 0.5
+    if stats["wagered"] > 0:
+        summary["ev_per_wager"] = stats["net"] / stats["wagered"]
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Runs a headless blackjack simulation across several processes.")
+    parser.add_argument("rounds", type = int)
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--decks", type = int, default = None)
+    parser.add_argument("--bet", type = int, default = 10)
+    args = parser.parse_args()
+    results = run_simulation(args.rounds, args.workers, args.seed, args.players, BasicStrategy(args.bet, rebuy = True), args.decks)
+    for key, value in summarize(results).items():
+        print("{key}: {value}".format(key = key, value = value))
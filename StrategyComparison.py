@@ -0,0 +1,201 @@
+import argparse
+import math
+import multiprocessing
+import random
+from array import array
+from collections import Counter
+from multiprocessing import shared_memory
+
+from BlackjackSimulator import GameState, BasicStrategy, CountingStrategy
+from Checkpoint import card_codes
+from RareEvents import Estimate
+from SimulationRunner import SimulationTable, new_stats, merge_stats, split_rounds
+
+#Compares strategies by playing every one of them through exactly the same shoes. The shoes are shuffled once, up front, and kept as one byte per card in a shared memory block that every worker process reads without copying.
+#Each strategy plays at its own table. Whenever the table would shuffle, it takes the next shoe from the stream instead, so shoe n is the same for every strategy even though they may play a different number of rounds from it. Results are added up per shoe, and the difference between two strategies is taken shoe by shoe. Shoes that favor the player favor every strategy, so the paired differences have far less noise than the results themselves.
+#If the shoe runs out mid-round while cards are still on the table, the table falls back to shuffling the discards with its own random number generator, like GameState.deal_cards always does.
+#Every shoe starts from the same state no matter what came before it: the players get a fresh buy-in and the table's random number generator is seeded from the table seed and the shoe number. Splitting the shoes among any number of workers gives the same results.
+
+#Shuffled shoes in a shared memory block, one row of card codes per shoe. The creating process should close() and unlink() the block when done, and other processes attach by name and only close().
+class ShoeStream:
+    def __init__(self, name, count, size, cards, create = False):
+        self.memory = shared_memory.SharedMemory(name = name, create = create, size = count * size if create else 0)
+        self.count = count
+        self.size = size
+        self.cards = cards #The distinct Cards, in code order.
+
+    #Shuffles count shoes the same way GameState.add_to_shoe does and writes them to a new shared memory block.
+    @classmethod
+    def generate(cls, count, seed = 0, **rules):
+        game = GameState(**rules)
+        codes, cards = card_codes(game)
+        deck = list(game.deck_list)
+        stream = cls(None, count, len(deck), cards, create = True)
+        rng = random.Random(seed)
+        for n in range(count):
+            rng.shuffle(deck)
+            stream.memory.buf[n * stream.size:(n + 1) * stream.size] = bytes(codes[id(c)] for c in deck)
+        return stream
+
+    #Returns a new list shoe of the cards in shoe n, dealt from the end like any list shoe.
+    def shoe(self, n):
+        cards = self.cards
+        return [cards[code] for code in self.memory.buf[n * self.size:(n + 1) * self.size]]
+
+    #Enough to attach to the same block from another process.
+    def handle(self):
+        return (self.memory.name, self.count, self.size, self.cards)
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+#A headless table that takes its shoes from a stream, starting at shoe start. It counts the actions taken on every hand, as recorded by Hand.resolve_action.
+class StreamTable(SimulationTable):
+    def __init__(self, stream, start, seed = None, **rules):
+        super().__init__(seed, compact_shoe = False, **rules)
+        self.seed = seed
+        self.stream = stream
+        self.next_shoe = start
+        self.current_shoe = None
+        self.actions = Counter()
+
+    #Starts the next shoe from the stream. The counters see a full shoe, as they would after any shuffle.
+    def load_shoe(self):
+        for c in self.counters.values():
+            c.remaining_tags = c.shoe_tags
+        self.rng.seed("{seed}:{shoe}".format(seed = self.seed, shoe = self.next_shoe))
+        self.shoe = self.stream.shoe(self.next_shoe)
+        self.discards.clear()
+        self.current_shoe = self.next_shoe
+        self.next_shoe += 1
+
+    def add_to_shoe(self):
+        if self.shoe or self.discards:
+            return super().add_to_shoe()
+        self.load_shoe()
+        return self.deck_value
+
+    def reshuffle(self):
+        if len(self.shoe) + len(self.discards) < len(self.deck_list): #Cards are still on the table.
+            return super().reshuffle()
+        self.load_shoe()
+
+    def round_cleanup(self):
+        for p in self.players_list:
+            for h in p.hands:
+                self.actions.update(h.actions)
+        super().round_cleanup()
+
+    #True if the next round will start the next shoe.
+    def shoe_finished(self):
+        return (not self.shoe and not self.discards) or len(self.shoe) <= self.get_cut_card()
+
+#Plays shoes start to end for every strategy. Takes a single tuple so it can be used with Pool.map. Returns the net result of each shoe, the table stats, and the action counts for each strategy.
+def play_shoes(job):
+    handle, start, end, seed, strategies, num_players, rules = job
+    stream = ShoeStream(*handle)
+    results = []
+    try:
+        for strategy in strategies:
+            table = StreamTable(stream, start, seed, **rules)
+            seated = [table.add_player("Player {num}".format(num = p + 1), strategy) for p in range(num_players)]
+            nets = array("d", [0.0] * (end - start))
+            rounds = array("I", [0] * (end - start))
+            while len(table.players_list) > 0:
+                if table.shoe_finished():
+                    if table.next_shoe >= end:
+                        break
+                    for p in seated:
+                        p.bankroll = table.buy_in
+                net = table.stats["net"]
+                if not table.play_tracked_round(seated):
+                    break
+                nets[table.current_shoe - start] += table.stats["net"] - net
+                rounds[table.current_shoe - start] += 1
+            results.append((nets, rounds, table.stats, table.actions))
+    finally:
+        stream.close()
+    return results
+
+#Plays every strategy through the same shuffled shoes and reports each one's results, and the paired difference of each strategy from the first, per shoe and per round, with confidence intervals.
+def compare_strategies(strategies, shoes = 10000, workers = None, seed = 0, num_players = 1, confidence = 0.95, **rules):
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    master = random.Random(seed)
+    stream = ShoeStream.generate(shoes, master.getrandbits(64), **rules)
+    try:
+        table_seed = master.getrandbits(64)
+        bounds = []
+        start = 0
+        for share in split_rounds(shoes, workers):
+            bounds.append((start, start + share))
+            start += share
+        jobs = [(stream.handle(), a, b, table_seed, strategies, num_players, rules) for a, b in bounds if b > a]
+        if len(jobs) == 1:
+            parts = [play_shoes(jobs[0])]
+        else:
+            with multiprocessing.Pool(len(jobs)) as pool:
+                parts = pool.map(play_shoes, jobs, chunksize = 1)
+    finally:
+        stream.close()
+        stream.unlink()
+    nets = [array("d") for s in strategies]
+    rounds = [array("I") for s in strategies]
+    stats = [new_stats() for s in strategies]
+    actions = [Counter() for s in strategies]
+    for part in parts:
+        for i, (n, r, st, ac) in enumerate(part):
+            nets[i].extend(n)
+            rounds[i].extend(r)
+            merge_stats(stats[i], st)
+            actions[i].update(ac)
+    report = {"shoes": shoes, "strategies": [], "differences": []}
+    for i, strategy in enumerate(strategies):
+        per_shoe = Estimate(confidence)
+        for n in nets[i]:
+            per_shoe.add(n)
+        summary = {"strategy": repr(strategy), "rounds": stats[i]["rounds"], "hands": stats[i]["hands"], "wagered": stats[i]["wagered"], "net": stats[i]["net"], "per_shoe": per_shoe.summary(), "actions": dict(actions[i])}
+        if stats[i]["rounds"]:
+            summary["ev_per_round"] = stats[i]["net"] / stats[i]["rounds"]
+        if stats[i]["wagered"]:
+            summary["ev_per_wager"] = stats[i]["net"] / stats[i]["wagered"]
+        report["strategies"].append(summary)
+    for i in range(1, len(strategies)):
+        paired = Estimate(confidence)
+        for a, b in zip(nets[0], nets[i]):
+            paired.add(b - a)
+        difference = paired.summary()
+        unpaired_error = math.sqrt(report["strategies"][0]["per_shoe"]["std_error"] ** 2 + report["strategies"][i]["per_shoe"]["std_error"] ** 2)
+        difference["unpaired_std_error"] = unpaired_error #What the error would be with independent shuffles.
+        rounds_per_shoe = (stats[0]["rounds"] + stats[i]["rounds"]) / (2 * shoes)
+        difference["per_round"] = {key: difference[key] / rounds_per_shoe for key in ["mean", "std_error", "low", "high"]} if rounds_per_shoe else {}
+        report["differences"].append(difference)
+    return report
+
+strategy_choices = {
+    "basic": lambda bet: BasicStrategy(bet, rebuy = True),
+    "counting": lambda bet: CountingStrategy(bet, rebuy = True),
+    "flat_counting": lambda bet: CountingStrategy(bet, rebuy = True, spread = 1),
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compares strategies on the same shuffled shoes and reports paired differences.")
+    parser.add_argument("strategies", nargs = "+", choices = sorted(strategy_choices), help = "The first strategy is the baseline.")
+    parser.add_argument("--shoes", type = int, default = 10000)
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--players", type = int, default = 1)
+    parser.add_argument("--decks", type = int, default = 6)
+    parser.add_argument("--bet", type = int, default = 10)
+    parser.add_argument("--confidence", type = float, default = 0.95)
+    args = parser.parse_args()
+    strategies = [strategy_choices[name](args.bet) for name in args.strategies]
+    report = compare_strategies(strategies, args.shoes, args.workers, args.seed, args.players, args.confidence, decks = args.decks, counting = ["Hi-Lo"])
+    for name, s in zip(args.strategies, report["strategies"]):
+        print("{name}: {rounds} rounds, EV per round {ev:.4f}, EV per unit wagered {wager:.4%}".format(name = name, rounds = s["rounds"], ev = s.get("ev_per_round", 0.0), wager = s.get("ev_per_wager", 0.0)))
+    for name, d in zip(args.strategies[1:], report["differences"]):
+        per_round = d["per_round"]
+        print("{name} - {base}: {mean:.4f} per round ({low:.4f} to {high:.4f}), paired error {paired:.2f} per shoe against {unpaired:.2f} unpaired".format(name = name, base = args.strategies[0], mean = per_round["mean"], low = per_round["low"], high = per_round["high"], paired = d["std_error"], unpaired = d["unpaired_std_error"]))
@@ -0,0 +1,227 @@
+import argparse
+import os
+import zlib
+
+from BlackjackSimulator import GameState, Strategy
+from DealerProbabilities import DealerProbabilities, count_cards
+
+#Works out the expected value of every action for every player hand against every upcard, with the shoe being the full set of decks minus the player's cards and the upcard. This is composition-dependent strategy: two hands with the same total can be played differently depending on the cards that make them up.
+#The rules match the object engine: the dealer checks for blackjack and stands on the table's dealer_stands_on total, a player blackjack pays the table's blackjack_payout and pushes against any dealer 21, and doubling and surrendering are allowed after splits. Split hands are valued as if only their own cards had left the shoe, and resplits are not counted.
+#Hands are written as sorted strings of card values ("A23456789T") and each entry lists the actions from best to worst: H hit, S stand, D double, R surrender, P split.
+
+card_chars = "A23456789T" #Indexed by GameState.get_card_value - 1.
+action_names = {"H": "hit", "S": "stand", "D": "double", "R": "surrender", "P": "split"}
+
+#Returns the best total of a hand of card values, counting one Ace as 11 when it fits.
+def hand_total(values):
+    total = sum(values)
+    if 1 in values and total + 10 <= 21:
+        total += 10
+    return total
+
+class StrategySolver:
+    def __init__(self, decks = 1, surrender_allowed = True, max_hands = 2, dealer_stands_on = 17, blackjack_payout = 1.5):
+        self.decks = decks
+        self.surrender_allowed = surrender_allowed
+        self.max_hands = max_hands
+        self.blackjack_payout = blackjack_payout
+        game = GameState(decks = decks) #Only needs the rank model. Tables don't build anything until they are used.
+        self.shoe = count_cards(game, game.deck_list)
+        self.dealer = DealerProbabilities(1000000, dealer_stands_on)
+        self.memo = {}
+
+    #Returns the counts left in the shoe once the given card values are out.
+    def remaining(self, values):
+        counts = list(self.shoe)
+        for v in values:
+            counts[v - 1] -= 1
+        return counts
+
+    #Dealer outcomes after the dealer has checked for blackjack.
+    def dealer_outcomes(self, hand, upcard):
+        return self.dealer.get_outcomes(upcard, tuple(self.remaining(hand + (upcard,))), True)
+
+    def stand_ev(self, hand, upcard):
+        total = hand_total(hand)
+        if total > 21:
+            return -1.0
+        outcomes = self.dealer_outcomes(hand, upcard)
+        ev = outcomes["bust"]
+        for d in range(self.dealer.stand_on, 22):
+            if total > d:
+                ev += outcomes[d]
+            elif total < d:
+                ev -= outcomes[d]
+        return ev
+
+    #A two-card 21 after a split counts as a blackjack, which pays the blackjack payout unless the dealer also reaches 21.
+    def blackjack_ev(self, hand, upcard):
+        return self.blackjack_payout * (1 - self.dealer_outcomes(hand, upcard)[21])
+
+    #Returns (stand, hit) expected values for a hand that can only hit or stand, playing the best of the two after every card.
+    def hit_stand(self, hand, upcard):
+        key = (hand, upcard)
+        if key not in self.memo:
+            stand = self.stand_ev(hand, upcard)
+            hit = 0.0
+            counts = self.remaining(hand + (upcard,))
+            left = sum(counts)
+            for v in range(1, 11):
+                if counts[v - 1] == 0:
+                    continue
+                new_hand = tuple(sorted(hand + (v,)))
+                if hand_total(new_hand) > 21:
+                    value = -1.0
+                else:
+                    value = max(self.hit_stand(new_hand, upcard))
+                hit += value * counts[v - 1] / left
+            self.memo[key] = (stand, hit)
+        return self.memo[key]
+
+    def double_ev(self, hand, upcard):
+        counts = self.remaining(hand + (upcard,))
+        left = sum(counts)
+        ev = 0.0
+        for v in range(1, 11):
+            if counts[v - 1] > 0:
+                ev += 2 * self.stand_ev(tuple(sorted(hand + (v,))), upcard) * counts[v - 1] / left
+        return ev
+
+    #Each split hand keeps one card, gets another, and is then played as a first-turn hand without splitting again.
+    def split_ev(self, hand, upcard):
+        counts = self.remaining(hand + (upcard,))
+        left = sum(counts)
+        ev = 0.0
+        for v in range(1, 11):
+            if counts[v - 1] == 0:
+                continue
+            new_hand = tuple(sorted((hand[0], v)))
+            if hand_total(new_hand) == 21:
+                value = self.blackjack_ev(new_hand, upcard)
+            else:
+                value = max(self.action_evs(new_hand, upcard, False).values())
+            ev += 2 * value * counts[v - 1] / left
+        return ev
+
+    #Returns the expected value of every action available to a hand. Hands with more than two cards can only hit or stand.
+    def action_evs(self, hand, upcard, allow_split = True):
+        stand, hit = self.hit_stand(hand, upcard)
+        evs = {"S": stand, "H": hit}
+        if len(hand) == 2:
+            evs["D"] = self.double_ev(hand, upcard)
+            if self.surrender_allowed:
+                evs["R"] = -0.5
+            if allow_split and hand[0] == hand[1] and self.max_hands > 1:
+                evs["P"] = self.split_ev(hand, upcard)
+        return evs
+
+    #Lists every hand that can be reached from a two-card start without reaching 21.
+    def reachable_hands(self):
+        hands = set()
+        pending = [(a, b) for a in range(1, 11) for b in range(a, 11)]
+        while pending:
+            hand = pending.pop()
+            if hand in hands or hand_total(hand) >= 21:
+                continue
+            hands.add(hand)
+            for v in range(1, 11):
+                if hand.count(v) < self.shoe[v - 1]:
+                    pending.append(tuple(sorted(hand + (v,))))
+        return hands
+
+    #Builds the full lookup table, mapping "upcard:hand" keys to the actions ranked from best to worst.
+    def solve(self):
+        table = {}
+        hands = self.reachable_hands()
+        for upcard in range(1, 11):
+            for hand in hands:
+                if hand.count(upcard) >= self.shoe[upcard - 1]:
+                    continue
+                evs = self.action_evs(hand, upcard)
+                table[make_key(upcard, hand)] = "".join(sorted(evs, key = evs.get, reverse = True))
+        return table
+
+    #The player's expected value of a round per unit bet, playing the best action for every starting hand. The house edge is the negative of this.
+    def round_ev(self):
+        ev = 0.0
+        total = sum(self.shoe)
+        for upcard in range(1, 11):
+            for a in range(1, 11):
+                for b in range(a, 11):
+                    counts = list(self.shoe)
+                    p = counts[upcard - 1] / total
+                    counts[upcard - 1] -= 1
+                    p *= counts[a - 1] / (total - 1)
+                    counts[a - 1] -= 1
+                    p *= counts[b - 1] / (total - 2)
+                    if a != b:
+                        p *= 2 #Either card can come first.
+                    if p == 0:
+                        continue
+                    hand = (a, b)
+                    outcomes = self.dealer.get_outcomes(upcard, tuple(self.remaining(hand + (upcard,))))
+                    dealer_blackjack = outcomes["blackjack"]
+                    if hand_total(hand) == 21: #A blackjack pushes against a dealer blackjack.
+                        ev += p * (1 - dealer_blackjack) * self.blackjack_ev(hand, upcard)
+                        continue
+                    ev += p * (-dealer_blackjack + (1 - dealer_blackjack) * max(self.action_evs(hand, upcard).values()))
+        return ev
+
+def make_key(upcard, hand):
+    return card_chars[upcard - 1] + ":" + "".join(card_chars[v - 1] for v in hand)
+
+#Builds the file name for a rule set so that tables for different rules can sit side by side.
+def table_name(decks, surrender_allowed, max_hands, dealer_stands_on = 17, blackjack_payout = 1.5):
+    return "strategy_{decks}d_{surrender}_{hands}h_s{stand}_bj{payout}.tbl".format(decks = decks, surrender = "ls" if surrender_allowed else "ns", hands = max_hands, stand = dealer_stands_on, payout = blackjack_payout)
+
+#Writes the table as compressed lines of "key actions".
+def save_table(table, path):
+    lines = "\n".join("{key} {actions}".format(key = k, actions = a) for k, a in sorted(table.items()))
+    with open(path, "wb") as f:
+        f.write(zlib.compress(lines.encode("ascii"), 9))
+
+def load_table(path):
+    with open(path, "rb") as f:
+        lines = zlib.decompress(f.read()).decode("ascii").split("\n")
+    return dict(line.split(" ") for line in lines if line)
+
+#Loads the table for a rule set from the directory, solving and saving it first if it has not been built yet.
+def get_table(decks, surrender_allowed, max_hands, directory = ".", dealer_stands_on = 17, blackjack_payout = 1.5):
+    path = os.path.join(directory, table_name(decks, surrender_allowed, max_hands, dealer_stands_on, blackjack_payout))
+    if not os.path.exists(path):
+        save_table(StrategySolver(decks, surrender_allowed, max_hands, dealer_stands_on, blackjack_payout).solve(), path)
+    return load_table(path)
+
+#Plays from a precomputed table, taking the best ranked action that is currently valid.
+class CompositionStrategy(Strategy):
+    def __init__(self, table, bet = 10, rebuy = False):
+        super().__init__(bet, rebuy)
+        self.table = table
+
+    #Builds the strategy for a table's rules, loading or solving the lookup table.
+    @classmethod
+    def for_game(cls, game, bet = 10, rebuy = False, directory = "."):
+        return cls(get_table(game.decks, game.surrender_allowed, game.max_hands, directory, game.dealer_stands_on, game.blackjack_payout), bet, rebuy)
+
+    def choose_action(self, hand, valid_actions, game):
+        upcard = game.get_card_value(game.dealer.hands[0].cards[0].rank)
+        values = sorted(game.get_card_value(c.rank) for c in hand.cards)
+        ranking = self.table.get(make_key(upcard, values), "HS" if hand.total < 17 else "S")
+        for a in ranking:
+            if action_names[a] in valid_actions:
+                return action_names[a]
+        return "stand"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Solves and saves the composition-dependent strategy table for a rule set.")
+    parser.add_argument("--decks", type = int, default = GameState.decks)
+    parser.add_argument("--no-surrender", action = "store_true")
+    parser.add_argument("--max-hands", type = int, default = GameState.max_hands)
+    parser.add_argument("--stands-on", type = int, default = GameState.dealer_stands_on)
+    parser.add_argument("--payout", type = float, default = GameState.blackjack_payout)
+    parser.add_argument("--directory", default = ".")
+    args = parser.parse_args()
+    solver = StrategySolver(args.decks, not args.no_surrender, args.max_hands, args.stands_on, args.payout)
+    path = os.path.join(args.directory, table_name(args.decks, not args.no_surrender, args.max_hands, args.stands_on, args.payout))
+    save_table(solver.solve(), path)
+    print("Saved {path}. House edge: {edge:.3%}".format(path = path, edge = -solver.round_ev()))
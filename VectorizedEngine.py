@@ -0,0 +1,210 @@
+import argparse
+import time
+
+import numpy as np
+
+from BlackjackSimulator import GameState, BasicStrategy
+from SimulationRunner import new_stats, summarize
+
+#Plays BasicStrategy for millions of rounds at once in NumPy arrays, with one player hand per round (split into at most two hands, as with the default max_hands). The rules follow the object engine: the dealer stands on 17, blackjacks pay 3:2, a player blackjack pushes against any dealer 21, a two-card 21 after a split counts as a blackjack, and doubling and surrendering are allowed after splits. Bankrolls are not tracked, so every double and split is affordable.
+#Each round deals from its own freshly shuffled shoe. Instead of shuffling, every card is drawn at random from the counts of each value left in that round's shoe, which deals the same way as a shuffled shoe without building one.
+
+HIT, STAND, DOUBLE, DOUBLE_STAND, SURRENDER, SPLIT = range(6)
+play_codes = {"H": HIT, "S": STAND, "D": DOUBLE, "B": DOUBLE_STAND, "R": SURRENDER, "P": SPLIT}
+
+#Converts the BasicStrategy tables into arrays indexed by [total or pair value, dealer upcard value]. Card values run from 2 to 11 (Ace).
+def build_tables(strategy = BasicStrategy):
+    hard = np.full((32, 12), HIT, dtype = np.int8)
+    soft = np.full((32, 12), HIT, dtype = np.int8)
+    pair = np.full((12, 12), HIT, dtype = np.int8)
+    hard[17:, :] = STAND
+    soft[19:, :] = STAND
+    for total, row in strategy.hard_table.items():
+        hard[total, 2:] = [play_codes[c] for c in row]
+    for total, row in strategy.soft_table.items():
+        soft[total, 2:] = [play_codes[c] for c in row]
+    for rank, row in strategy.pair_table.items():
+        pair[11 if rank == "A" else int(rank), 2:] = [play_codes[c] for c in row]
+    return hard, soft, pair
+
+#Counts the cards of each value from 2 to 11 (Ace) in one shoe, using the same rank model as GameState.
+def shoe_counts(decks):
+    game = GameState(decks = decks) #Only needs the rank model. Tables don't build anything until they are used.
+    counts = np.zeros(10, dtype = np.int16)
+    for c in game.deck_list:
+        counts[c.value - 2] += 1
+    return counts
+
+#Holds the state of one set of hands being played at the same time, each one from a different round.
+class HandArrays:
+    def __init__(self, rows):
+        size = len(rows)
+        self.rows = rows
+        self.total = np.zeros(size, dtype = np.int16)
+        self.soft = np.zeros(size, dtype = np.int16)
+        self.first = np.ones(size, dtype = bool)
+        self.done = np.zeros(size, dtype = bool)
+        self.bust = np.zeros(size, dtype = bool)
+        self.blackjack = np.zeros(size, dtype = bool)
+        self.bet = np.ones(size, dtype = np.float64)
+
+    #Adds a card to the selected hands, demoting soft Aces the same way as Hand.demote_ace.
+    def add_cards(self, selected, cards):
+        self.total[selected] += cards
+        self.soft[selected] += cards == 11
+        for d in range(4): #A hand can hold at most four soft Aces before one has to be demoted.
+            demote = selected[(self.total[selected] > 21) & (self.soft[selected] > 0)]
+            if len(demote) == 0:
+                break
+            self.total[demote] -= 10
+            self.soft[demote] -= 1
+
+class VectorizedEngine:
+    def __init__(self, decks = 1, surrender_allowed = True, seed = None, strategy = BasicStrategy):
+        self.decks = decks
+        self.surrender_allowed = surrender_allowed
+        self.rng = np.random.default_rng(seed)
+        self.shoe = shoe_counts(decks)
+        self.hard, self.soft, self.pair = build_tables(strategy)
+
+    #Deals the next card of each selected round and removes it from that round's shoe.
+    def draw(self, rows):
+        pick = self.rng.random(len(rows)) * self.left[rows]
+        running = np.zeros(len(rows))
+        index = np.zeros(len(rows), dtype = np.int16)
+        for v in range(9): #The card is the first value whose running count passes the pick. Going value by value is much faster than a cumulative sum across the short rows.
+            running += self.counts[v, rows]
+            index += running <= pick
+        self.counts[index, rows] -= 1
+        self.left[rows] -= 1
+        return index + 2
+
+    #Plays every hand until it is locked. Split hands are returned as a second HandArrays that still needs to be played.
+    def play_hands(self, hands, upcards, pair_values, allow_split):
+        second = None
+        while True:
+            active = np.flatnonzero(~hands.done)
+            if len(active) == 0:
+                return second
+            total = hands.total[active]
+            up = upcards[active]
+            first = hands.first[active]
+            play = np.where(hands.soft[active] > 0, self.soft[total, up], self.hard[total, up])
+            if allow_split:
+                can_split = first & (pair_values[active] > 0)
+                split_play = self.pair[pair_values[active], up]
+                play = np.where(can_split & (split_play == SPLIT), SPLIT, play)
+            action = np.where(play == SPLIT, SPLIT, HIT)
+            action = np.where(((play == DOUBLE) | (play == DOUBLE_STAND)) & first, DOUBLE, action)
+            if self.surrender_allowed:
+                action = np.where((play == SURRENDER) & first, SURRENDER, action)
+            action = np.where(((play == STAND) | ((play == DOUBLE_STAND) & ~first)), STAND, action)
+            hands.first[active[action != SPLIT]] = False
+
+            hands.done[active[action == STAND]] = True
+            surrender = active[action == SURRENDER]
+            hands.bet[surrender] = 0.5
+            hands.bust[surrender] = True
+            hands.done[surrender] = True
+            doubling = active[action == DOUBLE]
+            hands.bet[doubling] = 2
+            hitting = active[(action == HIT) | (action == DOUBLE)]
+            hands.add_cards(hitting, self.draw(hands.rows[hitting]))
+            hands.bust[hitting] = hands.total[hitting] > 21
+            hands.done[hitting] = hands.total[hitting] >= 21
+            hands.done[doubling] = True
+
+            splitting = active[action == SPLIT]
+            if len(splitting) > 0:
+                second = self.split(hands, splitting, pair_values)
+                allow_split = False #Only one split with the default max_hands of 2.
+
+    #Splits the selected hands. Each hand keeps one card and gets a new one, starting with the original hand, as in Player.split.
+    def split(self, hands, splitting, pair_values):
+        value = pair_values[splitting].astype(np.int16)
+        rows = hands.rows[splitting]
+        second = HandArrays(rows)
+        for h, selected in ((hands, splitting), (second, np.arange(len(rows)))):
+            h.total[selected] = value
+            h.soft[selected] = value == 11
+            h.add_cards(selected, self.draw(rows))
+            h.blackjack[selected] = h.total[selected] == 21
+            h.done[selected] = h.blackjack[selected]
+        return second
+
+    #Plays the dealer's hand for the selected rounds, standing on 17 like Player.dealer_turn.
+    def dealer_turn(self, dealer, rows):
+        while True:
+            hitting = rows[dealer.total[rows] < 17]
+            if len(hitting) == 0:
+                return
+            dealer.add_cards(hitting, self.draw(hitting))
+
+    #Settles a set of hands against the dealer with the same payouts as Hand.settle. Returns the net result of each hand in units of the initial bet.
+    def settle(self, hands, dealer_total, dealer_bust):
+        wins = ~hands.bust & (dealer_bust | (hands.total > dealer_total))
+        pushes = ~hands.bust & ~dealer_bust & (hands.total == dealer_total)
+        return np.where(wins, np.where(hands.blackjack, 1.5, 1.0), np.where(pushes, 0.0, -1.0)) * hands.bet
+
+    #Plays a chunk of rounds and returns the net result of each round along with the total wagered and the number of hands.
+    def play_chunk(self, rounds):
+        self.counts = np.repeat(self.shoe[:, None], rounds, axis = 1) #One column of value counts per round.
+        self.left = np.full(rounds, self.shoe.sum(), dtype = np.int16)
+        rows = np.arange(rounds)
+        player = HandArrays(rows)
+        dealer = HandArrays(rows)
+        dealt = [self.draw(rows) for d in range(4)] #Player, dealer, player, dealer, as in GameState.initial_deal.
+        for d in range(0, 4, 2):
+            player.add_cards(rows, dealt[d])
+            dealer.add_cards(rows, dealt[d + 1])
+        upcards = dealt[1]
+        pair_values = np.where(dealt[0] == dealt[2], dealt[0], 0).astype(np.int16)
+        player.blackjack = player.total == 21
+        dealer_blackjack = dealer.total == 21
+        player.done = player.blackjack | dealer_blackjack
+
+        second = self.play_hands(player, upcards, pair_values, True)
+        hands = [player]
+        if second is not None:
+            self.play_hands(second, upcards, pair_values, False)
+            hands.append(second)
+
+        live = ~player.bust & ~dealer_blackjack #The dealer only plays if a hand is still standing, as in GameState.bust_check.
+        if second is not None:
+            live[second.rows] |= ~second.bust
+        self.dealer_turn(dealer, np.flatnonzero(live))
+        dealer_bust = dealer.total > 21
+
+        net = np.where(dealer_blackjack, np.where(player.blackjack, 0.0, -1.0), self.settle(player, dealer.total, dealer_bust))
+        wagered = player.bet.sum()
+        if second is not None:
+            np.add.at(net, second.rows, self.settle(second, dealer.total[second.rows], dealer_bust[second.rows]))
+            wagered += second.bet.sum()
+        return net, wagered, rounds + (0 if second is None else len(second.rows))
+
+    #Plays the given number of rounds in chunks and returns totals in the same form as SimulationRunner, with every bet being one unit.
+    def simulate(self, rounds, chunk_size = 200000):
+        stats = new_stats()
+        while stats["rounds"] < rounds:
+            size = min(chunk_size, rounds - stats["rounds"])
+            net, wagered, hands = self.play_chunk(size)
+            stats["rounds"] += size
+            stats["hands"] += hands
+            stats["wagered"] += float(wagered)
+            stats["net"] += float(net.sum())
+            stats["net_squared"] += float((net * net).sum())
+        return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Plays basic strategy for many rounds at once with NumPy.")
+    parser.add_argument("rounds", type = int)
+    parser.add_argument("--decks", type = int, default = 1)
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--no-surrender", action = "store_true")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    results = VectorizedEngine(args.decks, not args.no_surrender, args.seed).simulate(args.rounds)
+    elapsed = time.perf_counter() - start
+    for key, value in summarize(results).items():
+        print("{key}: {value}".format(key = key, value = value))
+    print("rounds per second: {rate:.0f}".format(rate = results["rounds"] / elapsed))